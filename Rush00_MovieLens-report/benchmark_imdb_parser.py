@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import timeit
+import tracemalloc
+
+from movielens_analysis import Links
+
+#-------------------------------#
+#           Tester              #
+#-------------------------------#
+
+class ImdbParserTester:
+    """Compare BeautifulSoup parser of IMDb title pages with streaming `ImdbInfoParser`
+    """
+    def __init__(self, pages: list):
+        self.pages = pages
+
+    def parse_all(self, parser: str) -> list:
+        return [Links.parse_imdb_page(page, parser) for page in self.pages]
+
+    def get_peak_memory(self, parser: str) -> int:
+        tracemalloc.start()
+        self.parse_all(parser)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+
+
+def load_pages(directory: str) -> list:
+    """Read all saved html pages of directory
+    (./fixtures has one synthetic page only, save real IMDb title pages for representative numbers)
+    """
+    pages = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith('.html'):
+            with open(os.path.join(directory, filename), 'r', encoding='utf-8') as file:
+                pages.append(file.read())
+    return pages
+
+
+#-------------------------------#
+#             Main              #
+#-------------------------------#
+
+def main(directory: str):
+    # settings
+    ITERATIONS_NUMBER = 20
+
+    pages = load_pages(directory)
+    if not pages:
+        print(f'no .html pages in {directory}')
+        return
+    tester = ImdbParserTester(pages)
+    assert tester.parse_all('stream') == tester.parse_all('soup')
+
+    ## measure
+    time__soup = timeit.timeit(lambda: tester.parse_all('soup'), number=ITERATIONS_NUMBER)
+    time__stream = timeit.timeit(lambda: tester.parse_all('stream'), number=ITERATIONS_NUMBER)
+    memory__soup = tester.get_peak_memory('soup')
+    memory__stream = tester.get_peak_memory('stream')
+
+    ## prints
+    pages_number = len(pages) * ITERATIONS_NUMBER
+    print(f'{len(pages)} pages, {ITERATIONS_NUMBER} iterations')
+    print(f'soup   : {time__soup / pages_number * 1000:.3f}ms per page, '
+          f'peak {memory__soup / 1024:.0f}KiB')
+    print(f'stream : {time__stream / pages_number * 1000:.3f}ms per page, '
+          f'peak {memory__stream / 1024:.0f}KiB')
+    print(f'speedup: {time__soup / time__stream:.2f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) == 2 else './fixtures')
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import timeit
+import tempfile
+
+from movielens_analysis import Movies
+
+#-------------------------------#
+#           Tester              #
+#-------------------------------#
+
+class MoviesParserTester:
+    """Compare old line-by-line parser of movies.csv with batched `csv` parser
+    """
+    __csv_types = (int, str, str)
+
+    def __init__(self, filename: str):
+        self.filename = filename
+
+    @classmethod
+    def parse_line(cls, data_line: str) -> list:
+        """Old `Movies.__parse_line` implementation
+        """
+        data_line = data_line.replace('\n', '')
+
+        if data_line.find('"') != -1:
+            splitted = re.split(r',\"|\",', data_line)
+        else:
+            splitted = data_line.split(',')
+
+        return [cls.__csv_types[index](splitted[index])
+                for index in range(len(cls.__csv_types))]
+
+    def get_with_line_by_line(self) -> dict:
+        titles = {}
+        with open(self.filename, 'r', encoding='utf-8') as file:
+            line = file.readline()              # header line, ignore
+            line = file.readline()              # first data line
+            while line:
+                data = self.parse_line(line)
+                titles[data[0]] = data[1]
+                line = file.readline()          # data line
+        return titles
+
+    def get_with_csv_batches(self) -> list:
+        return Movies(self.filename, use_cache=False).titles_index
+
+
+def make_dataset(source_filename: str, target_filename: str, rows_number: int):
+    """Repeat rows of source movies.csv with new ids up to rows_number rows
+    """
+    with open(source_filename, 'r', encoding='utf-8') as file:
+        header = file.readline()
+        lines = [line.split(',', 1)[1] for line in file]
+
+    with open(target_filename, 'w', encoding='utf-8') as file:
+        file.write(header)
+        for movie_id in range(1, rows_number + 1):
+            file.write(f'{movie_id},{lines[movie_id % len(lines)]}')
+
+
+#-------------------------------#
+#             Main              #
+#-------------------------------#
+
+def main(source_filename: str):
+    # settings
+    ROWS_NUMBER = 60000
+    ITERATIONS_NUMBER = 10
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'movies.csv')
+        make_dataset(source_filename, filename, ROWS_NUMBER)
+        tester = MoviesParserTester(filename)
+
+        ## measure
+        time__line_by_line = timeit.timeit(tester.get_with_line_by_line,
+                                           number=ITERATIONS_NUMBER)
+        time__csv_batches = timeit.timeit(tester.get_with_csv_batches,
+                                          number=ITERATIONS_NUMBER)
+
+    ## prints
+    print(f'{ROWS_NUMBER} titles, {ITERATIONS_NUMBER} iterations')
+    print(f'line by line : {time__line_by_line:.3f}s')
+    print(f'csv batches  : {time__csv_batches:.3f}s')
+    print(f'speedup      : {time__line_by_line / time__csv_batches:.2f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) == 2 else './ml-latest-small/movies.csv')
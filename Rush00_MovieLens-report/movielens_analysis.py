@@ -1,13 +1,168 @@
 from collections import Counter, defaultdict
-from functools import reduce, lru_cache
-from datetime import datetime
+from functools import partial
+from datetime import datetime, date, timedelta, timezone
+from array import array
+from heapq import nlargest
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, islice, repeat
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlparse
+from html.parser import HTMLParser
 from typing_extensions import runtime
 
+import os
+import csv
+import math
+import hashlib
+import json
+import mmap
+import time
+import asyncio
+import sqlite3
+
 from bs4 import BeautifulSoup
 import requests
 import re
 
 import pytest
+import threading
+import tracemalloc
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+#-------------------------------#
+#       ColumnCache class       #
+#-------------------------------#
+
+class ColumnCache:
+    """
+    Binary cache of parsed csv columns, stored next to the csv file.
+    Numeric columns are memory-mapped on load, text columns are decoded at once.
+    Cache is valid while the size and the modification time of the csv file are the same.
+    """
+    suffix = '.cache'
+    __version = 4           # update on changes of format or parsing of csv files
+    __alignment = 8
+    __text_separator = '\0'
+
+    def __init__(self, path_to_the_file: str, suffix: str = None):
+        self.filename = path_to_the_file
+        self.cache_filename = path_to_the_file + (suffix if suffix is not None else self.suffix)
+
+    @staticmethod
+    def columns_from_rows(rows, headers: tuple, typecodes: tuple):
+        """Collect parsed rows into columns
+        Args:
+            rows: iterable of parsed data lines
+            headers (tuple): names of columns
+            typecodes (tuple): array typecodes of columns, None for text columns
+        Returns:
+            dict where the keys are headers and the values are arrays (or lists for text)
+        """
+        columns = [array(typecode) if typecode else [] for typecode in typecodes]
+        for data in rows:
+            for column, value in zip(columns, data):
+                column.append(value)
+        return dict(zip(headers, columns))
+
+    def __source_key(self):
+        stat = os.stat(self.filename)
+        return [self.__version, stat.st_size, stat.st_mtime_ns]
+
+    def load(self):
+        """Load columns from cache file
+        Returns:
+            dict with columns or None if cache is missing, outdated or broken
+        """
+        try:
+            with open(self.cache_filename, 'rb') as file:
+                header_size = int.from_bytes(file.read(8), 'little')
+                header = json.loads(file.read(header_size))
+                if header['key'] != self.__source_key():
+                    return None
+                buffer = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+            columns = {}
+            data_start = 8 + header_size
+            for name, typecode, length, offset, size in header['columns']:
+                if data_start + offset + size > len(buffer):
+                    return None                 # truncated cache file
+                data = buffer[data_start + offset:data_start + offset + size]
+                if typecode:
+                    columns[name] = data.cast(typecode)
+                elif length:
+                    columns[name] = str(data, 'utf-8').split(self.__text_separator)
+                else:
+                    columns[name] = []
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return columns
+
+    def save(self, columns: dict, source_key: list = None):
+        """Save columns to cache file (silently skipped if file can not be written)
+        Args:
+            columns (dict): columns to save, arrays or lists of strings
+            source_key (list): key of the csv file read before parsing it (the current one by default)
+        """
+        blobs, header_columns = [], []
+        offset = 0
+        for name, column in columns.items():
+            if isinstance(column, list):
+                typecode, blob = None, self.__text_separator.join(column).encode('utf-8')
+            else:
+                typecode, blob = column.typecode, column.tobytes()
+            header_columns.append([name, typecode, len(column), offset, len(blob)])
+            padding = -len(blob) % self.__alignment
+            blobs.append(blob + bytes(padding))
+            offset += len(blob) + padding
+
+        # data offsets are relative to the end of header, which is padded to alignment
+        if source_key is None:
+            source_key = self.__source_key()
+        header = json.dumps({'key': source_key, 'columns': header_columns}).encode()
+        header += b' ' * (-(len(header) + 8) % self.__alignment)
+
+        tmp_filename = f'{self.cache_filename}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_filename, 'wb') as file:
+                file.write(len(header).to_bytes(8, 'little'))
+                file.write(header)
+                for blob in blobs:
+                    file.write(blob)
+            os.replace(tmp_filename, self.cache_filename)
+        except OSError:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+
+    def get_columns(self, read_columns):
+        """Get columns from cache or parse them and update the cache
+        Args:
+            read_columns: function without arguments which parses the csv file into columns
+        Returns:
+            dict with columns
+        """
+        columns = self.load()
+        if columns is None:
+            # key is read before parsing, so columns of a file changed meanwhile are outdated
+            source_key = self.__source_key()
+            columns = read_columns()
+            self.save(columns, source_key)
+        return columns
+
+#-------------------------------#
+#        Top-n selection        #
+#-------------------------------#
+
+def top_n(items, n: int, key=lambda item: item[1]):
+    """Select top-n items by key descendingly without sorting all items (heap based).
+    Ties keep the original order of items, same as `sorted(items, key=key, reverse=True)[:n]`.
+    Args:
+        items: iterable of items, for example dict items
+        n (int): number of items to select
+        key: function which returns value to compare items by (second value of item by default)
+    Returns:
+        list of top-n items sorted by key descendingly
+    """
+    return nlargest(n, items, key=key)
 
 #-------------------------------#
 #         Movies class          #
@@ -19,73 +174,156 @@ class Movies:
     """
     __csv_headers = ('movieId','title','genres')
     __csv_types = (int, str, str)
+    __csv_typecodes = ('i', None, None)
+    __read_batch_size = 1024 * 16               # rows per batch
+    __release_year_pattern = re.compile(r'\((\d{4})\)')
+
+    null_year = -1                              # release year of titles without a year
+    max_genres_number = 32                      # bits in genres mask
 
     def __init__(self, path_to_the_file: str):
         self.filename = path_to_the_file
 
-    @classmethod
-    def __parse_line(cls, data_line: str):
-        data_line = data_line.replace('\n', '')
-
-        if data_line.find('"') != -1:
-            splitted = re.split(r',\"|\",', data_line)
-        else:
-            splitted = data_line.split(',')
-
-        return [cls.__csv_types[index](splitted[index])
-                for index in range(len(cls.__csv_headers))]
+    def __get_next_rows_batch(self):
+        # titles with commas and quotes are quoted by RFC 4180 rules, `csv` handles all the cases
+        with open(self.filename, 'r', encoding='utf-8', newline='') as file:
+            reader = csv.reader(file)
+            next(reader, None)                  # header line, ignore
+            rows = list(islice(reader, self.__read_batch_size))
+            while rows:
+                yield rows
+                rows = list(islice(reader, self.__read_batch_size))
 
     def get_next_data_line(self):
         """Read next data from file
         Yields:
             list with parsed values
         """
-        with open(self.filename, 'r', encoding='utf-8') as file:
-            line = file.readline()              # header line, ignore
-            line = file.readline()              # first data line
-            while line:
-                yield self.__parse_line(line)
-                line = file.readline()          # data line
+        for rows in self.__get_next_rows_batch():
+            for row in rows:
+                yield [cast(value) for cast, value in zip(self.__csv_types, row)]
 
-    def __init__(self, path_to_the_file):
+    def __init__(self, path_to_the_file, use_cache=True):
         self.filename = path_to_the_file
+        self.use_cache = use_cache
+        self.__columns = None
         self.__init_titles()
-        
+        self.__init_release_years()
+        self.__init_genres()
+
+    def get_columns(self):
+        """Get all data from file as columns.
+        File is parsed only once, parsed columns are cached on disk (see `ColumnCache`).
+        Returns:
+            dict where the keys are csv headers and the values are columns
+        """
+        if self.__columns is None:
+            if self.use_cache:
+                self.__columns = ColumnCache(self.filename).get_columns(self.__read_columns)
+            else:
+                self.__columns = self.__read_columns()
+        return self.__columns
+
+    def __read_columns(self):
+        columns = [array(typecode) if typecode else [] for typecode in self.__csv_typecodes]
+        for rows in self.__get_next_rows_batch():
+            for column, cast, values in zip(columns, self.__csv_types, zip(*rows)):
+                column.extend(values if cast is str else map(cast, values))
+        return dict(zip(self.__csv_headers, columns))
+
     def __init_titles(self):
-        self.titles = {}
-        for data in self.get_next_data_line():
-            self.titles[data[0]] = data[1]
+        # dense index: list position is movieId, None for missing ids
+        columns = self.get_columns()
+        self.titles_index = [None] * (max(columns['movieId'], default=-1) + 1)
+        for movie_id, title in zip(columns['movieId'], columns['title']):
+            self.titles_index[movie_id] = title
+
+    def __init_release_years(self):
+        # int16 column aligned with movieId column and inverted index year -> movieIds
+        self.release_years = array('h')
+        for title in self.get_columns()['title']:
+            year = self.__release_year_pattern.search(title)
+            self.release_years.append(int(year.group(1)) if year else self.null_year)
+
+        self.movies_by_release = defaultdict(lambda: array('i'))
+        for movie_id, year in zip(self.get_columns()['movieId'], self.release_years):
+            self.movies_by_release[year].append(movie_id)
+        self.movies_by_release = dict(sorted(self.movies_by_release.items()))
+
+    def __init_genres(self):
+        # vocabulary of genres (in order of first appearance) and uint32 mask of genres per movie
+        self.genres_vocabulary = []
+        self.genres_masks = array('I')
+        bits = {}
+        for genres in self.get_columns()['genres']:
+            mask = 0
+            for genre in genres.split('|'):
+                genre = genre.strip()
+                if not genre:
+                    continue
+                if genre not in bits:
+                    if len(bits) == self.max_genres_number:
+                        raise ValueError(f'more than {self.max_genres_number} genres')
+                    bits[genre] = 1 << len(bits)
+                    self.genres_vocabulary.append(genre)
+                mask |= bits[genre]
+            self.genres_masks.append(mask)
+
+    def get_genres_mask(self, genres):
+        """
+        The method receives a list of genres and returns their mask (as int)
+        """
+        mask = 0
+        for genre in genres:
+            if genre not in self.genres_vocabulary:
+                raise ValueError(f'unknown genre: {genre}')
+            mask |= 1 << self.genres_vocabulary.index(genre)
+        return mask
+
+    def get_movies_with_genres(self, genres, match_all=True):
+        """
+        The method returns a list of IDs of movies with all (or any, if match_all is False)
+        of the genres given as the argument
+        """
+        mask = self.get_genres_mask(genres)
+        movie_ids = self.get_columns()['movieId']
+        if match_all:
+            return [movie_id for movie_id, movie_mask in zip(movie_ids, self.genres_masks)
+                    if movie_mask & mask == mask]
+        return [movie_id for movie_id, movie_mask in zip(movie_ids, self.genres_masks)
+                if movie_mask & mask]
+
+    def get_movies_released(self, first_year: int, last_year: int):
+        """
+        The method returns a list of IDs of movies released from first_year to last_year (inclusive)
+        """
+        return [movie_id
+                for year, movie_ids in self.movies_by_release.items()
+                if first_year <= year <= last_year and year != self.null_year
+                for movie_id in movie_ids]
 
     def dist_by_release(self):
         """
         The method returns a dict or an OrderedDict where the keys are years and the values are counts.
         You need to extract years from the titles. Sort it by counts descendingly.
         """
-        years_distribution = Counter()
-        
-        for data in self.get_next_data_line():
-            year = re.search(r'\((\d{4})\)', data[1])
-            if year:
-                year = year.group(1)
-            else:
-                year = 'Null'
-            years_distribution[year] += 1
+        years_distribution = Counter(self.release_years)
 
-        return dict(years_distribution.most_common())
+        return {(f'{year:04d}' if year != self.null_year else 'Null'): count
+                for year, count in years_distribution.most_common()}
 
     def dist_by_genres(self):
         """
         The method returns a dict where the keys are genres and the values are counts.
         Sort it by counts descendingly.
         """
-        genres_distribution = Counter()
+        genres_distribution = Counter(dict.fromkeys(self.genres_vocabulary, 0))
 
-        for data in self.get_next_data_line():
-            genres = data[2].split('|')
-            for genre in genres:
-                genre = genre.strip()
-                if genre:
-                    genres_distribution[genre] += 1
+        # movies have few distinct combinations of genres, count bits of every combination once
+        for mask, count in Counter(self.genres_masks).items():
+            for bit, genre in enumerate(self.genres_vocabulary):
+                if mask >> bit & 1:
+                    genres_distribution[genre] += count
 
         return dict(genres_distribution.most_common())
 
@@ -95,17 +333,300 @@ class Movies:
         the values are the number of genres of the movie. Sort it by numbers descendingly.
         """
         dict_movies = {}
-        for data in self.get_next_data_line():
-            dict_movies[data[1]] = len(data[2].split('|'))
+        for title, mask in zip(self.get_columns()['title'], self.genres_masks):
+            dict_movies[title] = mask.bit_count()
 
-        return dict(sorted(dict_movies.items(), key=lambda x: x[1], reverse=True)[:n])
+        return dict(top_n(dict_movies.items(), n))
 
-    @lru_cache(maxsize=1024*1024*64) # 64 MB
     def get_movie_title(self, movie_id):
+        """
+        The method receives movie ID (as int) as input and returns the movie title
+        (None for unknown IDs)
+        """
+        if 0 <= movie_id < len(self.titles_index):
+            return self.titles_index[movie_id]
+        return None
+
+    def get_movie_titles(self, movie_ids):
         """
         The method receives a list of IDs (as int) as input and returns a list of movie titles
+        (None for unknown IDs)
+        """
+        titles_index, size = self.titles_index, len(self.titles_index)
+        return [titles_index[movie_id] if 0 <= movie_id < size else None
+                for movie_id in movie_ids]
+
+#-------------------------------#
+#      ImdbFetcher class        #
+#-------------------------------#
+
+class ImdbFetcher:
+    """
+    Concurrent fetcher of IMDb pages: asyncio tasks with bounded concurrency,
+    per-host rate limit and retries with exponential backoff.
+    Requests are made with `requests` in a pool of threads.
+    """
+    __retry_status_codes = (429, 500, 502, 503, 504)
+
+    def __init__(self, base_url: str = 'https://www.imdb.com/title/tt', concurrency: int = 8,
+                 requests_per_second: float = 10.0, retries: int = 3,
+                 backoff: float = 0.5, timeout: float = 30.0):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.requests_per_second = requests_per_second
+        self.retries = retries
+        self.backoff = backoff              # seconds before the first retry, doubled for next ones
+        self.timeout = timeout
+
+    async def fetch_async(self, imdb_ids):
+        """Fetch pages of movies concurrently
+        Args:
+            imdb_ids: iterable of IMDb IDs (as str)
+        Returns:
+            dict where the keys are IMDb IDs and the values are page texts (None if request failed)
+        """
+        imdb_ids = list(dict.fromkeys(imdb_ids))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        hosts_locks = defaultdict(asyncio.Lock)
+        hosts_next_time = defaultdict(float)
+
+        async def wait_rate_limit(host):
+            async with hosts_locks[host]:
+                delay = hosts_next_time[host] - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                hosts_next_time[host] = time.monotonic() + 1.0 / self.requests_per_second
+
+        async def fetch_one(executor, imdb_id):
+            url = self.base_url + imdb_id
+            loop = asyncio.get_running_loop()
+            async with semaphore:
+                for attempt in range(self.retries + 1):
+                    await wait_rate_limit(urlparse(url).netloc)
+                    try:
+                        page = await loop.run_in_executor(
+                            executor, partial(requests.get, url, timeout=self.timeout))
+                        if page.status_code == 200:
+                            return page.text
+                        if page.status_code not in self.__retry_status_codes:
+                            return None
+                    except requests.RequestException:
+                        pass
+                    if attempt < self.retries:
+                        await asyncio.sleep(self.backoff * 2 ** attempt)
+            return None
+
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            pages = await asyncio.gather(*(fetch_one(executor, imdb_id) for imdb_id in imdb_ids))
+        return dict(zip(imdb_ids, pages))
+
+    def fetch(self, imdb_ids):
+        """Fetch pages of movies concurrently (blocking call, works inside running event loop too)
+        Args:
+            imdb_ids: iterable of IMDb IDs (as str)
+        Returns:
+            dict where the keys are IMDb IDs and the values are page texts (None if request failed)
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.fetch_async(imdb_ids))
+
+        # event loop is already running (in notebook for example), use own loop in other thread
+        with ThreadPoolExecutor(1) as executor:
+            return executor.submit(asyncio.run, self.fetch_async(imdb_ids)).result()
+
+#-------------------------------#
+#        ImdbCache class        #
+#-------------------------------#
+
+class ImdbCache:
+    """
+    Persistent cache of parsed IMDb fields (SQLite database), keyed by IMDb ID.
+    Entries expire after `ttl` seconds, least recently used entries are evicted
+    when there are more than `max_entries` of them.
+    """
+    def __init__(self, path_to_the_file: str, ttl: float = 30 * 24 * 60 * 60,
+                 max_entries: int = 1024 * 1024):
+        self.filename = path_to_the_file
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.__connection = sqlite3.connect(path_to_the_file)
+        with self.__connection:
+            self.__connection.execute('CREATE TABLE IF NOT EXISTS fields ('
+                                      'imdb_id TEXT PRIMARY KEY, fields TEXT NOT NULL, '
+                                      'created REAL NOT NULL, accessed REAL NOT NULL)')
+            self.__connection.execute('CREATE INDEX IF NOT EXISTS fields_accessed '
+                                      'ON fields (accessed)')
+
+    def __len__(self):
+        return self.__connection.execute('SELECT COUNT(*) FROM fields').fetchone()[0]
+
+    def get_many(self, imdb_ids):
+        """Get cached fields of movies (expired entries are removed)
+        Args:
+            imdb_ids: iterable of IMDb IDs (as str)
+        Returns:
+            dict where the keys are found IMDb IDs and the values are dicts of fields
+        """
+        imdb_ids = list(dict.fromkeys(imdb_ids))
+        now = time.time()
+        result = {}
+        with self.__connection:
+            self.__connection.execute('DELETE FROM fields WHERE created < ?', (now - self.ttl,))
+            for index in range(0, len(imdb_ids), 512):      # sqlite limits number of parameters
+                part = imdb_ids[index:index + 512]
+                rows = self.__connection.execute(
+                    f'SELECT imdb_id, fields FROM fields WHERE imdb_id IN ({",".join("?" * len(part))})',
+                    part).fetchall()
+                result.update((imdb_id, json.loads(fields)) for imdb_id, fields in rows)
+            self.__connection.executemany('UPDATE fields SET accessed = ? WHERE imdb_id = ?',
+                                          ((now, imdb_id) for imdb_id in result))
+        self.hits += len(result)
+        self.misses += len(imdb_ids) - len(result)
+        return result
+
+    def get(self, imdb_id: str):
+        """Get cached fields of movie
+        Returns:
+            dict of fields or None if movie is not cached
+        """
+        return self.get_many([imdb_id]).get(imdb_id)
+
+    def put_many(self, items: dict):
+        """Save fields of movies, evicting least recently used entries if cache is full
+        Args:
+            items (dict): a dict where the keys are IMDb IDs and the values are dicts of fields
         """
-        return self.titles.get(movie_id)
+        now = time.time()
+        with self.__connection:
+            self.__connection.executemany(
+                'INSERT OR REPLACE INTO fields (imdb_id, fields, created, accessed) VALUES (?, ?, ?, ?)',
+                ((imdb_id, json.dumps(fields), now, now) for imdb_id, fields in items.items()))
+            self.__connection.execute(
+                'DELETE FROM fields WHERE imdb_id IN ('
+                'SELECT imdb_id FROM fields ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,))
+
+    def put(self, imdb_id: str, fields: dict):
+        """Save fields of movie
+        """
+        self.put_many({imdb_id: fields})
+
+    def close(self):
+        self.__connection.close()
+
+#-------------------------------#
+#      ImdbInfoParser class     #
+#-------------------------------#
+
+class ImdbInfoParser(HTMLParser):
+    """
+    Streaming parser of the info block of IMDb title page.
+    Extracts the same fields as BeautifulSoup search over the page (labels and texts
+    of `li.ipc-metadata-list__item` items of the 6th `div.ipc-page-content-container`),
+    but builds no tree and stops reading the page right after the info block.
+    """
+    __container_class = 'ipc-page-content-container'
+    __item_class = 'ipc-metadata-list__item'
+    __label_class = 'ipc-metadata-list-item__label'
+    __value_class = 'ipc-metadata-list-item__content-container'
+    __void_tags = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+                             'link', 'meta', 'param', 'source', 'track', 'wbr'))
+
+    class __InfoBlockEnd(Exception):
+        pass
+
+    def __init__(self, container_index: int = 5):
+        super().__init__(convert_charrefs=True)
+        self.container_index = container_index
+        self.result = {}
+        self.__stack = []               # names of open tags
+        self.__containers = 0
+        self.__container_depth = None   # depths (in stack) of the elements being read
+        self.__item_depth = None
+        self.__label_depth = None
+        self.__value_depth = None
+        self.__label = None             # parts of texts of current item
+        self.__value = None
+
+    @staticmethod
+    def __has_class(attrs, class_name: str):
+        return any(name == 'class' and value and class_name in value.split()
+                   for name, value in attrs)
+
+    @classmethod
+    def parse(cls, page: str, container_index: int = 5):
+        """Parse info block of page
+        Returns:
+            dict where the keys are labels and the values are texts (None if there is no text block)
+        Raises:
+            IndexError: raises if page has no info block
+        """
+        parser = cls(container_index)
+        try:
+            parser.feed(page)
+            parser.close()
+        except cls.__InfoBlockEnd:
+            return parser.result
+        raise IndexError('info block is not found')
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.__void_tags:
+            return
+        self.__stack.append(tag)
+        depth = len(self.__stack)
+
+        if self.__container_depth is None:
+            if tag == 'div' and self.__has_class(attrs, self.__container_class):
+                if self.__containers == self.container_index:
+                    self.__container_depth = depth
+                self.__containers += 1
+        elif (tag == 'li' and ('role', 'presentation') in attrs
+                and self.__has_class(attrs, self.__item_class)):
+            if self.__item_depth is not None:
+                self.__close_item()     # previous item is not closed, BeautifulSoup finds both
+            self.__item_depth = depth
+            self.__label = self.__value = None
+        elif self.__item_depth is None:
+            return
+        elif self.__label is None and self.__has_class(attrs, self.__label_class):
+            self.__label_depth = depth
+            self.__label = []
+        elif self.__value is None and self.__has_class(attrs, self.__value_class):
+            self.__value_depth = depth
+            self.__value = []
+
+    def handle_endtag(self, tag):
+        if tag in self.__void_tags or tag not in self.__stack:
+            return                      # stray end tag, ignore
+        while self.__stack.pop() != tag:
+            self.__close_element(len(self.__stack) + 1)
+        self.__close_element(len(self.__stack) + 1)
+
+    def __close_element(self, depth: int):
+        if depth == self.__label_depth:
+            self.__label_depth = None
+        if depth == self.__value_depth:
+            self.__value_depth = None
+        if depth == self.__item_depth:
+            self.__close_item()
+        if depth == self.__container_depth:
+            raise self.__InfoBlockEnd()
+
+    def __close_item(self):
+        self.__item_depth = self.__label_depth = self.__value_depth = None
+        if self.__label is not None:
+            self.result[''.join(self.__label).strip()] = \
+                ''.join(self.__value) if self.__value is not None else None
+
+    def handle_data(self, data):
+        if self.__label_depth is not None:
+            self.__label.append(data)
+        if self.__value_depth is not None:
+            self.__value.append(data)
 
 #-------------------------------#
 #          Links class          #
@@ -118,6 +639,21 @@ class Links:
     __csv_headers = ('movieId','imdbId','tmdbId')
     __csv_separator = ','
     __csv_types = (int, str, lambda x: int(x) if x else 0)
+    __csv_typecodes = ('i', None, 'i')
+
+    __enrichment_fields = {             # enrichment column -> IMDb field
+        'director': 'Director',
+        'budget': 'Budget',
+        'gross': 'Gross worldwide',
+        'runtime': 'Runtime',
+    }
+
+    null_number = -1                    # value of missing amounts and runtimes
+    __currency_symbols = {'$': 'USD', '€': 'EUR', '£': 'GBP', '¥': 'JPY', '₹': 'INR',
+                          'CA$': 'CAD', 'A$': 'AUD', 'NZ$': 'NZD', 'HK$': 'HKD', 'R$': 'BRL',
+                          'MX$': 'MXN', '₩': 'KRW', '₽': 'RUB', '₺': 'TRY', '₱': 'PHP'}
+    __money_pattern = re.compile(r'\s*([^\d\s]*)\s*(\d[\d,]*)')
+    __runtime_pattern = re.compile(r'(?:(\d+)\s*h(?:ours?)?)?\s*(?:(\d+)\s*m(?:in(?:utes?)?)?)?')
 
     __film_page_base_urls = {
         'movielens': 'https://movielens.org/movies/',
@@ -125,11 +661,25 @@ class Links:
         'tmdb': 'https://www.themoviedb.org/movie/'
     }
 
-    def __init__(self, path_to_the_file: str, movies_cls: Movies):
+    def __init__(self, path_to_the_file: str, movies_cls: Movies, use_cache=True,
+                 fetcher: ImdbFetcher = None, imdb_cache: ImdbCache = None,
+                 html_parser: str = 'stream'):
         self.filename = path_to_the_file
         if not isinstance(movies_cls, Movies):
             raise ValueError('invalid Movies class object')
         self.movies_cls = movies_cls
+        self.use_cache = use_cache
+        self.fetcher = fetcher if fetcher is not None else ImdbFetcher(self.__film_page_base_urls['imdb'])
+        if imdb_cache is None and use_cache:
+            try:
+                imdb_cache = ImdbCache(path_to_the_file + '.imdb.sqlite')
+            except sqlite3.Error:
+                imdb_cache = None       # database can not be created, work without it
+        self.imdb_cache = imdb_cache    # persistent cache of parsed fields, None to disable
+        self.html_parser = html_parser  # 'stream' or 'soup', see `parse_imdb_page`
+        self.__columns = None
+        self.__imdb_fields = {}         # imdbId -> parsed fields of the page
+        self.__enrichment = None
 
     @classmethod
     def __parse_line(cls, data_line: str):
@@ -149,15 +699,73 @@ class Links:
                 yield self.__parse_line(line)
                 line = file.readline()          # data line
 
-    @lru_cache(maxsize=1024*1024*128) # 128 MB
-    def __get_imdb_all_fields(self, movie_imdb_id: str):
-        # request page
-        page = requests.get(self.__film_page_base_urls['imdb'] + movie_imdb_id)
-        if page.status_code != 200:
+    def get_columns(self):
+        """Get all data from file as columns.
+        File is parsed only once, parsed columns are cached on disk (see `ColumnCache`).
+        Returns:
+            dict where the keys are csv headers and the values are columns
+        """
+        if self.__columns is None:
+            if self.use_cache:
+                self.__columns = ColumnCache(self.filename).get_columns(self.__read_columns)
+            else:
+                self.__columns = self.__read_columns()
+        return self.__columns
+
+    def __read_columns(self):
+        return ColumnCache.columns_from_rows(self.get_next_data_line(),
+                                             self.__csv_headers, self.__csv_typecodes)
+
+    def __get_links(self):
+        columns = self.get_columns()
+        return zip(columns['movieId'], columns['imdbId'])
+
+    def prefetch_imdb(self, imdb_ids):
+        """Fetch concurrently and parse IMDb pages of movies which were not fetched yet
+        (pages from persistent cache are not fetched at all)
+        Args:
+            imdb_ids: iterable of IMDb IDs (as str)
+        Raises:
+            RuntimeError: raises if any request was failed
+        """
+        missing_ids = [imdb_id for imdb_id in dict.fromkeys(imdb_ids)
+                       if imdb_id not in self.__imdb_fields]
+        if missing_ids and self.imdb_cache is not None:
+            self.__imdb_fields.update(self.imdb_cache.get_many(missing_ids))
+            missing_ids = [imdb_id for imdb_id in missing_ids if imdb_id not in self.__imdb_fields]
+        if not missing_ids:
+            return
+
+        pages = self.fetcher.fetch(missing_ids)
+        fetched = {imdb_id: self.parse_imdb_page(page, self.html_parser)
+                   for imdb_id, page in pages.items() if page is not None}
+        self.__imdb_fields.update(fetched)
+        if self.imdb_cache is not None:
+            self.imdb_cache.put_many(fetched)
+        if len(fetched) != len(pages):
             raise RuntimeError("imdb request failed")
 
+    def __get_imdb_all_fields(self, movie_imdb_id: str):
+        if movie_imdb_id not in self.__imdb_fields:
+            self.prefetch_imdb([movie_imdb_id])
+        return self.__imdb_fields[movie_imdb_id]
+
+    @staticmethod
+    def parse_imdb_page(page: str, parser: str = 'stream'):
+        """Parse info block of IMDb title page
+        Args:
+            page (str): html of the page
+            parser (str): 'stream' for `ImdbInfoParser` or 'soup' for BeautifulSoup
+        Returns:
+            dict where the keys are labels and the values are texts
+        """
+        if parser == 'stream':
+            return ImdbInfoParser.parse(page)
+        if parser != 'soup':
+            raise ValueError(f'unknown parser: {parser}')
+
         # get info block
-        soup = BeautifulSoup(page.text, features='html.parser')
+        soup = BeautifulSoup(page, features='html.parser')
         soup = soup.find_all('div', attrs={'class': 'ipc-page-content-container'})[5]
         soup = soup.find_all('li', attrs={'role': 'presentation', 'class': 'ipc-metadata-list__item'})
 
@@ -179,6 +787,63 @@ class Links:
         result = [all_fields.get(field) for field in list_of_fields]
         return [str(movie_links[0]), *result]
 
+    @classmethod
+    def parse_money(cls, text: str):
+        """Parse amount of money, for example '$1,234,567 (estimated)' -> (1234567, 'USD')
+        Returns:
+            tuple of amount (int) and ISO currency code (the symbol itself if it is unknown),
+            (`null_number`, None) if text is None or has no amount
+        """
+        match = cls.__money_pattern.match(text) if text is not None else None
+        if match is None:
+            return cls.null_number, None
+        currency = match[1]
+        return int(match[2].replace(',', '')), cls.__currency_symbols.get(currency, currency)
+
+    @classmethod
+    def parse_runtime(cls, text: str):
+        """Parse runtime, for example '2 hours 15 minutes' -> 135, '2 hours' -> 120
+        Returns:
+            number of minutes (int), `null_number` if text is None or is not a runtime
+        """
+        match = cls.__runtime_pattern.fullmatch(text.strip()) if text is not None else None
+        if match is None or match[1] is None and match[2] is None:
+            return cls.null_number
+        return int(match[1] or 0) * 60 + int(match[2] or 0)
+
+    def get_enrichment(self):
+        """Get IMDb fields of all movies of file as a table
+        (all pages are fetched in one batch, only on the first call).
+        Strings of fields are parsed to numeric columns once, when the table is built.
+        Returns:
+            dict where the keys are 'movieId', 'director', 'budget', 'gross', 'runtime'
+            (raw strings, None for missing values), 'budget_amount', 'gross_amount' (array of int64),
+            'budget_currency', 'gross_currency' (ISO codes), 'runtime_minutes' (array of int16),
+            numeric values of missing fields are `null_number`
+        """
+        if self.__enrichment is None:
+            columns = self.get_columns()
+            self.prefetch_imdb(columns['imdbId'])
+
+            enrichment = {'movieId': columns['movieId']}
+            enrichment.update((column, []) for column in self.__enrichment_fields)
+            for imdb_id in columns['imdbId']:
+                fields = self.__get_imdb_all_fields(imdb_id)
+                for column, field in self.__enrichment_fields.items():
+                    enrichment[column].append(fields.get(field))
+
+            for column in ('budget', 'gross'):
+                amounts, currencies = array('q'), []
+                for text in enrichment[column]:
+                    amount, currency = self.parse_money(text)
+                    amounts.append(amount)
+                    currencies.append(currency)
+                enrichment[f'{column}_amount'] = amounts
+                enrichment[f'{column}_currency'] = currencies
+            enrichment['runtime_minutes'] = array('h', map(self.parse_runtime, enrichment['runtime']))
+            self.__enrichment = enrichment
+        return self.__enrichment
+
     def get_imdb(self, list_of_movies, list_of_fields):
         """
         The method returns a list of lists [movieId, field1, field2, field3, ...] for the list of movies given as the argument (movieId).
@@ -186,8 +851,10 @@ class Links:
         The values should be parsed from the IMDB webpages of the movies.
         Sort it by movieId descendingly.
         """
+        self.prefetch_imdb(imdb_id for movie_id, imdb_id in self.__get_links()
+                           if movie_id in list_of_movies)
         imdb_info = [self.__get_imdb_movie_info(data, list_of_fields) 
-                     for data in self.get_next_data_line()
+                     for data in self.__get_links()
                      if data[0] in list_of_movies]
         return list(sorted(imdb_info, key=lambda fields: fields[0]))
 
@@ -196,24 +863,26 @@ class Links:
         The method returns a dict with top-n directors where the keys are directors and 
         the values are numbers of movies created by them. Sort it by numbers descendingly.
         """
-        directors_list = [self.__get_imdb_movie_info(data, ['Director'])
-                          for data in self.get_next_data_line()]
-        directors_list = map(lambda pair: pair[1], directors_list)
-        directors_counter = Counter(directors_list)
+        directors_counter = Counter(self.get_enrichment()['director'])
         return dict(directors_counter.most_common(n))
 
+    def __top_movies(self, scores, n, values=None):
+        # scores: (row of enrichment table, score) pairs of movies with known values
+        top = top_n(scores, n)
+        enrichment = self.get_enrichment()
+        titles = self.movies_cls.get_movie_titles([enrichment['movieId'][row] for row, _ in top])
+        return {title: values[row] if values is not None else score
+                for title, (row, score) in zip(titles, top)}
+
     def most_expensive(self, n):
         """
         The method returns a dict with top-n movies where the keys are movie titles and
         the values are their budgets. Sort it by budgets descendingly.
         """
-        budgets = [self.__get_imdb_movie_info(data, ['Budget'])
-                   for data in self.get_next_data_line()]
-        budgets = map(lambda item: (
-                        self.movies_cls.get_movie_title(self.__csv_types[0](item[0])),
-                        item[1] if item[1] is not None else ''
-                    ), budgets)
-        return dict(sorted(budgets, key=lambda item: item[1], reverse=True)[:n])
+        enrichment = self.get_enrichment()
+        budgets = ((row, amount) for row, amount in enumerate(enrichment['budget_amount'])
+                   if amount != self.null_number)
+        return self.__top_movies(budgets, n, enrichment['budget'])
 
     def most_profitable(self, n):
         """
@@ -221,20 +890,13 @@ class Links:
         the values are the difference between worldwide gross and budget.
         Sort it by the difference descendingly.
         """
-        profits = []
-        for data in self.get_next_data_line():
-            info = self.__get_imdb_movie_info(data, ['Gross worldwide', 'Budget'])
-            
-            if info[1] is None or info[2] is None:
-                profits.append([self.movies_cls.get_movie_title(data[0]), float('NaN')])
-                continue
-            
-            values = (float(re.sub(r'[^\d.]', '', info[1])), float(re.sub(r'[^\d.]', '', info[2])))
-            profits.append([
-                self.movies_cls.get_movie_title(data[0]),
-                round(values[0] - values[1], 2)])
-
-        return dict(sorted(profits, key=lambda item: item[1] if item[1] is not None else '', reverse=True)[:n])
+        enrichment = self.get_enrichment()
+        profits = ((row, float(gross - budget)) for row, (gross, budget, gross_currency, budget_currency)
+                   in enumerate(zip(enrichment['gross_amount'], enrichment['budget_amount'],
+                                    enrichment['gross_currency'], enrichment['budget_currency']))
+                   if gross != self.null_number and budget != self.null_number
+                   and gross_currency == budget_currency)
+        return self.__top_movies(profits, n)
 
     def longest(self, n):
         """
@@ -242,20 +904,10 @@ class Links:
         the values are their runtime. If there are more than one version – choose any.
         Sort it by runtime descendingly.
         """
-        runtimes = [self.__get_imdb_movie_info(data, ['Runtime'])
-                    for data in self.get_next_data_line()]
-        runtimes = map(lambda item: (
-                        self.movies_cls.get_movie_title(self.__csv_types[0](item[0])),
-                        item[1]
-                    ), runtimes)
-        
-        def key_func(item):         # text to minutes
-            if item[1] is None:
-                return float('-inf')
-            item = item[1].split()
-            return int(item[0]) * 60 + int(item[2])
-        
-        return dict(sorted(runtimes, key=key_func, reverse=True)[:n])
+        enrichment = self.get_enrichment()
+        runtimes = ((row, minutes) for row, minutes in enumerate(enrichment['runtime_minutes'])
+                    if minutes != self.null_number)
+        return self.__top_movies(runtimes, n, enrichment['runtime'])
 
     def top_cost_per_minute(self, n):
         """
@@ -263,69 +915,864 @@ class Links:
         the values are the budgets divided by their runtime. The budgets can be in different currencies – do not pay attention to it.
         The values should be rounded to 2 decimals. Sort it by the division descendingly.
         """
-        costs = []
-        for data in self.get_next_data_line():
-            info = self.__get_imdb_movie_info(data, ['Budget', 'Runtime'])
-            
-            if info[1] is None or info[2] is None:
-                costs.append([self.movies_cls.get_movie_title(data[0]), float('NaN')])
-                continue
-            
-            budget_value = float(re.sub(r'[^\d.]', '', info[1]))
-            runtime_value = info[2].split()
-            runtime_value = int(runtime_value[0]) * 60 + int(runtime_value[2])
-            costs.append([
-                self.movies_cls.get_movie_title(data[0]),
-                round(budget_value / runtime_value, 2)])
+        enrichment = self.get_enrichment()
+        costs = ((row, round(budget / minutes, 2)) for row, (budget, minutes)
+                 in enumerate(zip(enrichment['budget_amount'], enrichment['runtime_minutes']))
+                 if budget != self.null_number and minutes > 0)
+        return self.__top_movies(costs, n)
+
+
+
+#-------------------------------#
+#       Statistics class        #
+#-------------------------------#
 
-        return dict(sorted(costs, key=lambda item: item[1] if item[1] is not None else '', reverse=True)[:n])
+class Statistics:
+    """
+    Statistics utils
+    """
+    @staticmethod
+    def average(values: list):
+        """Get average value of values list
+        """
+        return sum(values) / len(values)
 
+    @staticmethod
+    def median(values: list):
+        """Get median value of values list
+        """
+        if len(values) == 0:
+            raise ValueError('provided list is empty')
+
+        if len(values) == 1:
+            return float(values[0])
+
+        values = sorted(values)
+        mid = int(len(values) / 2)
+        if len(values) % 2:
+            return float(values[mid])
+        return (values[mid - 1] + values[mid]) / 2.0
+
+    @staticmethod
+    def variance(values: list):
+        """Calculate variance of values list (in one pass)
+        """
+        if len(values) == 0:
+            raise ValueError('provided list is empty')
+
+        return RunningStatistics().update(values).variance()
+
+
+class RunningStatistics:
+    """
+    Online count, average and variance of values (Welford's method).
+    Partial statistics (for example of different parts of a file) can be merged.
+    """
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2        # sum of squared differences from the mean
+
+    def add(self, value):
+        """Add one value
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        return self
+
+    def update(self, values):
+        """Add all values of iterable
+        """
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        """Add all values of other statistics (Chan's parallel formula)
+        """
+        if other.count == 0:
+            return self
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        return self
+
+    def average(self):
+        """Get average value of added values
+        """
+        if self.count == 0:
+            raise ValueError('no values were added')
+        return float(self.mean)
+
+    def variance(self):
+        """Get variance of added values
+        """
+        if self.count == 0:
+            raise ValueError('no values were added')
+        return float(self.m2 / self.count)
+
+    @classmethod
+    def group(cls, pairs):
+        """Get statistics of values grouped by keys in one pass, without storing the values
+        Args:
+            pairs: iterable of (key, value) pairs, for example rows read from file
+        Returns:
+            dict where the keys are groups keys and the values are statistics
+        """
+        result = {}
+        for key, value in pairs:
+            statistics = result.get(key)
+            if statistics is None:
+                statistics = result[key] = cls()
+            statistics.add(value)
+        return result
+
+
+class QuantileSketch:
+    """
+    Bounded-memory streaming quantile (median by default) of values.
+
+    Up to `exact_limit` values are kept as they are and the quantile is exact.
+    Then values are counted in buckets of `error` width: the result differs from
+    the exact quantile by at most `error / 2` and memory depends only on the range of values.
+    Sketch can be passed as `metric` to the reports instead of `Statistics.median`.
+    """
+    def __init__(self, quantile: float = 0.5, error: float = 0.01, exact_limit: int = 1024):
+        if not 0.0 <= quantile <= 1.0:
+            raise ValueError('quantile must be in [0, 1]')
+        if error <= 0:
+            raise ValueError('error must be positive')
+        self.quantile = quantile
+        self.error = error
+        self.exact_limit = exact_limit
+        self.count = 0
+        self.__values = []          # exact values, None after switching to buckets
+        self.__buckets = Counter()  # bucket index -> number of values
+
+    def copy_empty(self):
+        """Get new empty sketch with the same settings
+        """
+        return QuantileSketch(self.quantile, self.error, self.exact_limit)
+
+    def add(self, value, count: int = 1):
+        """Add value `count` times
+        """
+        self.count += count
+        if self.__values is not None:
+            if len(self.__values) + count <= self.exact_limit:
+                self.__values.extend([value] * count)
+                return self
+            values, self.__values = self.__values, None   # switch to buckets, without a list of count values
+            for old_value in values:
+                self.__buckets[round(old_value / self.error)] += 1
+        self.__buckets[round(value / self.error)] += count
+        return self
+
+    def update(self, values):
+        """Add all values of iterable
+        """
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        """Add all values of other sketch with the same settings
+        """
+        if other.__values is not None:
+            for value in other.__values:
+                self.add(value)
+        else:
+            for bucket, count in other.__buckets.items():
+                self.add(bucket * other.error, count)
+        return self
+
+    def result(self):
+        """Get quantile of added values (interpolated between the closest ranks)
+        """
+        if self.count == 0:
+            raise ValueError('no values were added')
+
+        position = (self.count - 1) * self.quantile
+        low_rank, high_rank = int(position), min(int(position) + 1, self.count - 1)
+
+        if self.__values is not None:
+            values = sorted(self.__values)
+            low, high = values[low_rank], values[high_rank]
+        else:
+            low = high = None
+            seen = 0
+            for bucket in sorted(self.__buckets):
+                seen += self.__buckets[bucket]
+                if low is None and low_rank < seen:
+                    low = bucket * self.error
+                if high_rank < seen:
+                    high = bucket * self.error
+                    break
+
+        return float(low + (high - low) * (position - low_rank))
+
+    def __call__(self, values: list):
+        """Get quantile of values list (same interface as `Statistics.median`)
+        """
+        return self.copy_empty().update(values).result()
+
+
+class CountMinSketch:
+    """
+    Bounded-memory approximate counting of items (Count-Min sketch).
+
+    Counts are kept in `depth` rows of `width` counters, where width = ceil(e / error)
+    and depth = ceil(ln(1 / failure)). Estimated count of an item is never less than the
+    exact one and exceeds it by at most `error * total` with probability `1 - failure`.
+    Most common items are tracked among at most `candidates` items with the highest estimates.
+    """
+    def __init__(self, error: float = 0.001, failure: float = 0.01, candidates: int = 1024):
+        if error <= 0 or not 0.0 < failure < 1.0:
+            raise ValueError('error must be positive and failure must be in (0, 1)')
+        self.error = error
+        self.failure = failure
+        self.candidates = candidates
+        self.width = math.ceil(math.e / error)
+        self.depth = math.ceil(math.log(1 / failure))
+        self.total = 0
+        self.__rows = [array('q', bytes(8 * self.width)) for _ in range(self.depth)]
+
+    def copy_empty(self):
+        """Get new empty sketch with the same settings
+        """
+        return CountMinSketch(self.error, self.failure, self.candidates)
+
+    def __positions(self, item):
+        # rows are indexed by h1 + i * h2 (Kirsch-Mitzenmacher) of one 64-bit digest,
+        # stable between processes unlike `hash`
+        digest = int.from_bytes(hashlib.blake2b(str(item).encode(), digest_size=8).digest(), 'little')
+        first, second, width = digest & 0xffffffff, digest >> 32 | 1, self.width
+        return [(first + index * second) % width for index in range(self.depth)]
+
+    def add(self, item, count: int = 1):
+        """Add item `count` times
+        Returns:
+            estimated count of item after adding
+        """
+        self.total += count
+        estimate = None
+        for row, position in zip(self.__rows, self.__positions(item)):
+            row[position] += count
+            if estimate is None or row[position] < estimate:
+                estimate = row[position]
+        return estimate
+
+    def estimate(self, item):
+        """Get estimated count of item
+        """
+        return min(row[position] for row, position in zip(self.__rows, self.__positions(item)))
+
+    def most_common(self, items, n: int):
+        """Count all items of iterable and get n most common of them
+        Returns:
+            list of (item, estimated count) pairs sorted by counts descendingly
+        """
+        limit = max(self.candidates, n)
+        candidates = {}
+        for item in items:
+            candidates[item] = self.add(item)
+            if len(candidates) > 2 * limit:     # prune to the best candidates, amortized O(1)
+                candidates = dict(top_n(candidates.items(), limit))
+        return top_n(((item, self.estimate(item)) for item in candidates), n)
+
+
+class GroupStatistics:
+    """
+    Statistics of values grouped by keys (for example ratings grouped by movieId).
+
+    Values are counted per (key, value) pair in one pass over the columns,
+    all statistics are computed from these counts without per-group lists of values.
+    Works best when values have few distinct values (like ratings).
+    Encoded values (like `RatingCodes`) are decoded by `decode` once per distinct pair.
+    """
+    def __init__(self, keys, values, decode=None):
+        self.__counts = Counter(keys)                   # keys in order of first appearance
+        self.__histogram = Counter(zip(keys, values))
+        if decode is not None:
+            self.__histogram = Counter({(key, decode(value)): count
+                                        for (key, value), count in self.__histogram.items()})
+
+    def count(self):
+        """Get number of values in every group
+        Returns:
+            dict where the keys are groups keys and the values are counts
+        """
+        return dict(self.__counts)
+
+    def sum(self):
+        """Get sum of values in every group
+        """
+        sums = dict.fromkeys(self.__counts, 0.0)
+        for (key, value), count in self.__histogram.items():
+            sums[key] += value * count
+        return sums
+
+    def running(self):
+        """Get mergeable statistics of every group
+        Returns:
+            dict where the keys are groups keys and the values are `RunningStatistics`
+        """
+        result = {key: RunningStatistics() for key in self.__counts}
+        for (key, value), count in self.__histogram.items():
+            result[key].merge(RunningStatistics(count, value))
+        return result
+
+    def average(self):
+        """Get average value of every group
+        """
+        return {key: total / self.__counts[key] for key, total in self.sum().items()}
+
+    def variance(self):
+        """Get variance of values of every group
+        """
+        return {key: statistics.variance() for key, statistics in self.running().items()}
+
+    def median(self):
+        """Get median value of every group
+        """
+        # sorted pairs are grouped by key and sorted by value inside the group
+        positions = {key: ((count - 1) // 2, count // 2) for key, count in self.__counts.items()}
+        lower, upper = {}, {}
+        seen = 0
+        previous_key = None
+        for (key, value), count in sorted(self.__histogram.items()):
+            if key != previous_key:
+                previous_key, seen = key, 0
+            seen += count
+            low, high = positions[key]
+            if key not in lower and low < seen:
+                lower[key] = value
+            if key not in upper and high < seen:
+                upper[key] = value
+        return {key: (lower[key] + upper[key]) / 2.0 for key in self.__counts}
+
+    def sketches(self, sketch):
+        """Get quantile sketch of every group, without lists of values
+        Args:
+            sketch (QuantileSketch): sketch with settings to use
+        Returns:
+            dict where the keys are groups keys and the values are sketches
+        """
+        result = {key: sketch.copy_empty() for key in self.__counts}
+        for (key, value), count in self.__histogram.items():
+            result[key].add(value, count)
+        return result
+
+    def values(self):
+        """Get values of every group
+        Returns:
+            dict where the keys are groups keys and the values are lists of values
+        """
+        result = {key: [] for key in self.__counts}
+        for (key, value), count in self.__histogram.items():
+            result[key].extend([value] * count)
+        return result
+
+    def aggregate(self, metric):
+        """Get metric of values of every group.
+        `Statistics` metrics are computed from the counts,
+        any other metric is applied to lists of values of the groups.
+        Args:
+            metric: function which takes a list of values (like `Statistics.average`)
+        Returns:
+            dict where the keys are groups keys and the values are metric values
+        """
+        kernels = {
+            Statistics.average: self.average,
+            Statistics.median: self.median,
+            Statistics.variance: self.variance,
+        }
+        if metric in kernels:
+            return kernels[metric]()
+        if isinstance(metric, QuantileSketch):
+            return {key: sketch.result() for key, sketch in self.sketches(metric).items()}
+        return {key: metric(values) for key, values in self.values().items()}
+
+
+
+#-------------------------------#
+#     CalendarBuckets class     #
+#-------------------------------#
+
+class CalendarBuckets:
+    """
+    Counting of unix timestamps by calendar periods: 'year', 'month', 'week' (ISO) or 'day'
+    in timezone `tz` (local timezone if None, same as `datetime.fromtimestamp`).
+    Start times of the periods between the first and the last timestamps are computed once,
+    then timestamps are assigned to periods by binary search over them,
+    without converting every timestamp to datetime.
+    """
+    units = ('year', 'month', 'week', 'day')
+
+    def __init__(self, unit: str = 'year', tz=None):
+        if unit not in self.units:
+            raise ValueError(f'unknown unit: {unit}')
+        self.unit = unit
+        self.tz = tz
+
+    def __first_day(self, day: date):
+        if self.unit == 'year':
+            return day.replace(month=1, day=1)
+        if self.unit == 'month':
+            return day.replace(day=1)
+        if self.unit == 'week':
+            return day - timedelta(days=day.weekday())
+        return day
+
+    def __next_day(self, day: date):
+        if self.unit == 'year':
+            return day.replace(year=day.year + 1)
+        if self.unit == 'month':
+            return day.replace(year=day.year + 1, month=1) if day.month == 12 \
+                else day.replace(month=day.month + 1)
+        return day + timedelta(days=7 if self.unit == 'week' else 1)
+
+    def __label(self, day: date):
+        if self.unit == 'year':
+            return day.year
+        if self.unit == 'month':
+            return day.year, day.month
+        if self.unit == 'week':
+            return day.isocalendar()[:2]
+        return day
+
+    def get_boundaries(self, first: int, last: int):
+        """Get periods which cover timestamps from `first` to `last`
+        Returns:
+            tuple of list of start timestamps (int) of periods (sorted) and list of their labels:
+            year (int), (year, month), (ISO year, ISO week) or date
+        """
+        starts, labels = [], []
+        day = self.__first_day(datetime.fromtimestamp(first, self.tz).date())
+        while True:
+            start = int(datetime(day.year, day.month, day.day, tzinfo=self.tz).timestamp())
+            if start > last:
+                break
+            starts.append(start)
+            labels.append(self.__label(day))
+            day = self.__next_day(day)
+        return starts, labels
+
+    def count(self, timestamps):
+        """Count timestamps by periods
+        Returns:
+            dict where the keys are labels of periods (see `get_boundaries`) and
+            the values are counts, sorted by periods ascendingly (empty periods are skipped)
+        """
+        if not len(timestamps):
+            return {}
+        starts, labels = self.get_boundaries(min(timestamps), max(timestamps))
+        counts = Counter(map(partial(bisect_right, starts), timestamps))
+        return {labels[index - 1]: counts[index] for index in sorted(counts)}
+
+#-------------------------------#
+#       RatingCodes class       #
+#-------------------------------#
+
+class RatingCodes:
+    """
+    Half-star ratings (0.5 to 5.0) stored as uint8 codes, code = rating * 2.
+    Histogram of codes is a list of `max_code + 1` counters (counted over bytes, like `bincount`),
+    distribution, mean and variance are computed from it without decoding every value.
+    """
+    typecode = 'B'
+    max_code = 10
+    __codes = {f'{code / 2:.1f}': code for code in range(1, max_code + 1)}  # '0.5' -> 1, ...
+
+    @classmethod
+    def encode(cls, rating):
+        """Get code of rating (str or number)
+        Raises:
+            ValueError: raises if rating is not a half-star value from 0.5 to 5.0
+        """
+        code = cls.__codes.get(rating)
+        if code is not None:
+            return code
+        code = float(rating) * 2
+        if not code.is_integer() or not 1 <= code <= cls.max_code:
+            raise ValueError(f'invalid rating: {rating}')
+        return int(code)
+
+    @staticmethod
+    def decode(code: int):
+        """Get rating of code
+        """
+        return code / 2
+
+    @classmethod
+    def histogram(cls, codes):
+        """Get numbers of every code
+        Args:
+            codes: array of codes (or any bytes-like object)
+        Returns:
+            list where the indexes are codes and the values are counts
+        """
+        data = bytes(codes)
+        return [data.count(code) for code in range(cls.max_code + 1)]
+
+    @classmethod
+    def distribution(cls, codes):
+        """Get numbers of ratings
+        Returns:
+            dict where the keys are ratings and the values are counts, sorted by ratings ascendingly
+        """
+        return {cls.decode(code): count for code, count in enumerate(cls.histogram(codes)) if count}
+
+    @classmethod
+    def histogram_mean(cls, histogram: list):
+        """Get average rating of histogram of codes
+        """
+        count = sum(histogram)
+        if count == 0:
+            raise ValueError('no values were added')
+        return cls.decode(sum(code * number for code, number in enumerate(histogram)) / count)
+
+    @classmethod
+    def histogram_variance(cls, histogram: list):
+        """Get variance of ratings of histogram of codes
+        """
+        count = sum(histogram)
+        if count == 0:
+            raise ValueError('no values were added')
+        mean = sum(code * number for code, number in enumerate(histogram)) / count
+        m2 = sum((code - mean) ** 2 * number for code, number in enumerate(histogram))
+        return m2 / count / 4      # codes are ratings scaled by 2
+
+    @classmethod
+    def histogram_median(cls, histogram: list):
+        """Get median rating of histogram of codes (average of two middle values for even count)
+        """
+        count = sum(histogram)
+        if count == 0:
+            raise ValueError('no values were added')
+        low_rank, high_rank = (count - 1) // 2, count // 2
+        low = high = None
+        seen = 0
+        for code, number in enumerate(histogram):
+            seen += number
+            if low is None and low_rank < seen:
+                low = code
+            if high_rank < seen:
+                high = code
+                break
+        return (cls.decode(low) + cls.decode(high)) / 2.0
+
+    @classmethod
+    def mean(cls, codes):
+        """Get average rating
+        """
+        return cls.histogram_mean(cls.histogram(codes))
+
+    @classmethod
+    def variance(cls, codes):
+        """Get variance of ratings
+        """
+        return cls.histogram_variance(cls.histogram(codes))
+
+    @classmethod
+    def median(cls, codes):
+        """Get median rating
+        """
+        return cls.histogram_median(cls.histogram(codes))
+
+#-------------------------------#
+#   RatingsAggregates class     #
+#-------------------------------#
+
+class RatingsAggregates:
+    """
+    Mergeable aggregates of ratings.csv lines:
+    counters (by year, by rating, by user), statistics of ratings (by movie, by user)
+    and histograms of `RatingCodes` (by movie, by user) for medians and other metrics
+    """
+    def __init__(self):
+        self.rows = 0
+        self.years = Counter()              # year -> number of ratings
+        self.ratings = Counter()            # rating -> number of ratings
+        self.users = Counter()              # userId -> number of ratings
+        self.movies_statistics = {}         # movieId -> RunningStatistics of ratings
+        self.users_statistics = {}          # userId -> RunningStatistics of ratings
+        self.movies_histograms = {}         # movieId -> numbers of every rating code
+        self.users_histograms = {}          # userId -> numbers of every rating code
+
+    @staticmethod
+    def __merge_statistics(statistics: dict, other: dict):
+        for key, value in other.items():
+            if key in statistics:
+                statistics[key].merge(value)
+            else:
+                statistics[key] = value
+
+    @staticmethod
+    def __count_histograms(keys, codes):
+        histograms = {}
+        for (key, code), count in Counter(zip(keys, codes)).items():
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = histograms[key] = [0] * (RatingCodes.max_code + 1)
+            histogram[code] += count
+        return histograms
+
+    @staticmethod
+    def __histogram_statistics(histogram: list):
+        # same as `GroupStatistics.running`, from counts of every rating
+        statistics = RunningStatistics()
+        for code, count in enumerate(histogram):
+            if count:
+                statistics.merge(RunningStatistics(count, RatingCodes.decode(code)))
+        return statistics
+
+    @staticmethod
+    def __merge_histograms(histograms: dict, other: dict):
+        for key, other_histogram in other.items():
+            histogram = histograms.get(key)
+            if histogram is None:
+                histograms[key] = list(other_histogram)
+            else:
+                for code, count in enumerate(other_histogram):
+                    histogram[code] += count
+
+    @staticmethod
+    def aggregate(histograms: dict, metric):
+        """Get metric of ratings of every key of histograms (same metrics as `GroupStatistics.aggregate`)
+        Args:
+            histograms (dict): `movies_histograms` or `users_histograms`
+            metric: function which takes a list of values (like `Statistics.average`)
+        Returns:
+            dict where the keys are keys of histograms and the values are metric values
+        """
+        kernels = {
+            Statistics.average: RatingCodes.histogram_mean,
+            Statistics.median: RatingCodes.histogram_median,
+            Statistics.variance: RatingCodes.histogram_variance,
+        }
+        if metric in kernels:
+            kernel = kernels[metric]
+            return {key: kernel(histogram) for key, histogram in histograms.items()}
+
+        result = {}
+        for key, histogram in histograms.items():
+            if isinstance(metric, QuantileSketch):
+                sketch = metric.copy_empty()
+                for code, count in enumerate(histogram):
+                    if count:
+                        sketch.add(RatingCodes.decode(code), count)
+                result[key] = sketch.result()
+            else:
+                result[key] = metric([RatingCodes.decode(code)
+                                      for code, count in enumerate(histogram) for _ in range(count)])
+        return result
+
+    def add_columns(self, columns: dict):
+        """Add rows of ratings columns (like `Ratings.get_columns` result, ratings are `RatingCodes`)
+        """
+        user_ids, movie_ids = columns['userId'], columns['movieId']
+        ratings, timestamps = columns['rating'], columns['timestamp']
+
+        self.rows += len(ratings)
+        self.years.update(CalendarBuckets('year').count(timestamps))
+        self.ratings.update(RatingCodes.distribution(ratings))
+        self.users.update(user_ids)
+        # every (key, rating) pair is counted once, statistics are derived from the histograms
+        for keys, histograms, statistics in ((movie_ids, self.movies_histograms, self.movies_statistics),
+                                             (user_ids, self.users_histograms, self.users_statistics)):
+            batch_histograms = self.__count_histograms(keys, ratings)
+            self.__merge_statistics(statistics, {key: self.__histogram_statistics(histogram)
+                                                 for key, histogram in batch_histograms.items()})
+            self.__merge_histograms(histograms, batch_histograms)
+        return self
+
+    def add_lines(self, lines: list):
+        """Add not parsed data lines of ratings.csv
+        """
+        columns = Ratings.parse_lines([line for line in lines if line.strip()])
+        return self.add_columns(columns)
+
+    def to_dict(self):
+        """Get state of aggregates as a dict of lists (JSON serializable, keys keep their types)
+        """
+        return {
+            'rows': self.rows,
+            'years': list(self.years.items()),
+            'ratings': list(self.ratings.items()),
+            'users': list(self.users.items()),
+            'movies_statistics': [[key, value.count, value.mean, value.m2]
+                                  for key, value in self.movies_statistics.items()],
+            'users_statistics': [[key, value.count, value.mean, value.m2]
+                                 for key, value in self.users_statistics.items()],
+            'movies_histograms': list(self.movies_histograms.items()),
+            'users_histograms': list(self.users_histograms.items()),
+        }
 
+    @classmethod
+    def from_dict(cls, state: dict):
+        """Restore aggregates from `to_dict` result
+        """
+        aggregates = cls()
+        aggregates.rows = state['rows']
+        aggregates.years = Counter(dict(state['years']))
+        aggregates.ratings = Counter(dict(state['ratings']))
+        aggregates.users = Counter(dict(state['users']))
+        aggregates.movies_statistics = {key: RunningStatistics(count, mean, m2)
+                                        for key, count, mean, m2 in state['movies_statistics']}
+        aggregates.users_statistics = {key: RunningStatistics(count, mean, m2)
+                                       for key, count, mean, m2 in state['users_statistics']}
+        aggregates.movies_histograms = dict(state['movies_histograms'])
+        aggregates.users_histograms = dict(state['users_histograms'])
+        return aggregates
+
+    def merge(self, other):
+        """Add all rows of other aggregates
+        """
+        self.rows += other.rows
+        self.years.update(other.years)
+        self.ratings.update(other.ratings)
+        self.users.update(other.users)
+        self.__merge_statistics(self.movies_statistics, other.movies_statistics)
+        self.__merge_statistics(self.users_statistics, other.users_statistics)
+        self.__merge_histograms(self.movies_histograms, other.movies_histograms)
+        self.__merge_histograms(self.users_histograms, other.users_histograms)
+        return self
 
 #-------------------------------#
-#       Statistics class        #
+#     RatingsMatrix class       #
 #-------------------------------#
 
-class Statistics:
+class RatingsMatrix:
     """
-    Statistics utils
+    Sparse user x movie matrix of ratings in CSR (compressed sparse row) format.
+    Ids are remapped to compact indexes: row `i` is user `row_ids[i]`, column `j` is movie `col_ids[j]`.
+    Ratings of row `i` are `data[indptr[i]:indptr[i + 1]]` (as `RatingCodes`)
+    in columns `indices[indptr[i]:indptr[i + 1]]`, sorted by columns.
     """
-    @staticmethod
-    def average(values: list):
-        """Get average value of values list
+    def __init__(self, row_ids, col_ids, indptr, indices, data):
+        self.row_ids = row_ids          # array of ids of rows, sorted
+        self.col_ids = col_ids          # array of ids of columns, sorted
+        self.indptr = indptr            # int64, number of rows + 1
+        self.indices = indices          # int32, column of every value
+        self.data = data                # uint8 codes of ratings
+
+    @classmethod
+    def from_columns(cls, row_keys, col_keys, codes):
+        """Build matrix from columns of ratings (pairs of keys are expected to be unique)
+        Args:
+            row_keys: ids of rows (for example userId column)
+            col_keys: ids of columns (for example movieId column)
+            codes: ratings as `RatingCodes`
         """
-        return sum(values) / len(values)
+        row_ids = array('i', sorted(set(row_keys)))
+        col_ids = array('i', sorted(set(col_keys)))
+        row_index = {key: index for index, key in enumerate(row_ids)}
+        col_index = {key: index for index, key in enumerate(col_ids)}
 
-    @staticmethod
-    def median(values: list):
-        """Get median value of values list
+        rows = array('i', map(row_index.__getitem__, row_keys))
+        cols = array('i', map(col_index.__getitem__, col_keys))
+        return cls.__from_coordinates(row_ids, col_ids, rows, cols, codes)
+
+    @classmethod
+    def __from_coordinates(cls, row_ids, col_ids, rows, cols, codes):
+        # counting sort: numbers of values in rows give `indptr`, values are scattered
+        # to the preallocated buffers, then sorted by columns inside every row
+        rows_counts = Counter(rows)
+        indptr = array('q', [0])
+        indptr.extend(accumulate(rows_counts[row] for row in range(len(row_ids))))
+
+        positions = indptr[:-1]                 # next free position of every row
+        indices = array('i', bytes(4 * len(rows)))
+        data = array(RatingCodes.typecode, bytes(len(rows)))
+        for row, col, code in zip(rows, cols, codes):
+            position = positions[row]
+            indices[position] = col
+            data[position] = code
+            positions[row] = position + 1
+
+        for start, end in zip(indptr, islice(indptr, 1, None)):
+            row_indices = indices[start:end]
+            if row_indices.tolist() != sorted(row_indices):
+                row_values = sorted(zip(row_indices, data[start:end]))
+                indices[start:end] = array('i', (col for col, _ in row_values))
+                data[start:end] = array(RatingCodes.typecode, (code for _, code in row_values))
+        return cls(row_ids, col_ids, indptr, indices, data)
+
+    @property
+    def shape(self):
+        return len(self.row_ids), len(self.col_ids)
+
+    def __len__(self):
+        """Get number of stored values
         """
-        if len(values) == 0:
-            raise ValueError('provided list is empty')
+        return len(self.data)
 
-        if len(values) == 1:
-            return float(values[0])
+    def get_row(self, row: int):
+        """Get values of row
+        Returns:
+            tuple of columns indexes and ratings (decoded)
+        """
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.indices[start:end], [RatingCodes.decode(code) for code in self.data[start:end]]
 
-        values = sorted(values)
-        mid = int(len(values) / 2)
-        if len(values) % 2:
-            return float(values[mid])
-        return (values[mid - 1] + values[mid]) / 2.0
+    def row_counts(self):
+        """Get number of values in every row
+        """
+        indptr = self.indptr
+        return array('q', (end - start for start, end in zip(indptr, islice(indptr, 1, None))))
 
-    @classmethod
-    def variance(cls, values: list):
-        """Calculate variance of values list
+    def row_sums(self):
+        """Get sum of ratings in every row
         """
-        mean = cls.average(values)
+        data, indptr = self.data, self.indptr
+        return [RatingCodes.decode(sum(data[start:end]))
+                for start, end in zip(indptr, islice(indptr, 1, None))]
 
-        def reduce_func(prev, curr):
-            diff = curr - mean
-            return prev + diff * diff
-        squares_sum = reduce(reduce_func, values)
+    def row_means(self):
+        """Get average rating of every row (NaN for empty rows)
+        """
+        return [total / count if count else float('NaN')
+                for total, count in zip(self.row_sums(), self.row_counts())]
 
-        return squares_sum / len(values)
+    def col_counts(self):
+        """Get number of values in every column
+        """
+        counts = Counter(self.indices)
+        return array('q', (counts[col] for col in range(len(self.col_ids))))
 
+    def col_sums(self):
+        """Get sum of ratings in every column
+        """
+        sums = [0] * len(self.col_ids)
+        for col, code in zip(self.indices, self.data):
+            sums[col] += code
+        return [RatingCodes.decode(total) for total in sums]
 
+    def transpose(self):
+        """Get the same values as movie x user matrix (CSC format of this matrix)
+        """
+        rows = array('i')
+        for row, count in enumerate(self.row_counts()):
+            rows.extend(repeat(row, count))
+        # values are scattered in order of rows, so columns of transposed rows are sorted already
+        return RatingsMatrix.__from_coordinates(self.col_ids, self.row_ids, self.indices, rows, self.data)
+
+    def to_scipy(self):
+        """Get matrix as `scipy.sparse.csr_matrix` of ratings (scipy is optional, imported on call)
+        Raises:
+            ImportError: raises if scipy is not installed
+        """
+        from scipy.sparse import csr_matrix
+        data = array('d', map(RatingCodes.decode, self.data))
+        return csr_matrix((data, self.indices, self.indptr), shape=self.shape)
 
 #-------------------------------#
 #        Ratings class          #
@@ -338,17 +1785,49 @@ class Ratings:
 
     __csv_headers = ('userId','movieId','rating','timestamp')
     __csv_separator = ','
-    __csv_types = (int, int, float, int)
+    __csv_types = (int, int, RatingCodes.encode, int)            # types of columns
+    __csv_typecodes = ('i', 'i', RatingCodes.typecode, 'q')    # int32, int32, uint8, int64
+    __line_types = (int, int, float, int)                       # types of `get_next_data_line` values
+    __read_batch_size = 1024 * 1024 * 4         # 4 MB of text per batch
+    __state_version = 2                         # update on changes of `RatingsAggregates` state
+    __state_checksum_size = 4096                # bytes before the offset to detect rewritten files
 
-    def __init__(self, path_to_the_file: str):
+    state_suffix = '.aggregates.json'
+
+    def __init__(self, path_to_the_file: str, use_cache=True, workers=1, incremental=False):
         self.filename = path_to_the_file
+        self.use_cache = use_cache
+        self.workers = workers          # processes for `scan`, reports use `scan` if more than 1
+        self.incremental = incremental  # `scan` only appended lines, reports use `scan`
+        self.scanned_bytes = 0          # bytes of data lines parsed by the last `scan`
+        self.__columns = None
+        self.__aggregates = None
+        self.__matrix = None
+
+    def use_scan(self):
+        """Check whether reports are computed from `scan` aggregates instead of columns
+        """
+        return self.workers > 1 or self.incremental
 
     @classmethod
     def __parse_line(cls, data_line: str):
         splitted = data_line.split(cls.__csv_separator)
-        return [cls.__csv_types[index](splitted[index]) 
+        return [cls.__line_types[index](splitted[index]) 
                 for index in range(len(cls.__csv_headers))]
 
+    @classmethod
+    def __new_columns(cls):
+        return dict(zip(cls.__csv_headers, (array(typecode) for typecode in cls.__csv_typecodes)))
+
+    @classmethod
+    def __extend_columns(cls, columns: dict, lines: list):
+        splitted = [line.split(cls.__csv_separator) for line in lines]
+        for line, values in zip(lines, splitted):
+            if len(values) != len(cls.__csv_headers):
+                raise ValueError(f'invalid line, {len(cls.__csv_headers)} values expected: {line!r}')
+        for column, cast, values in zip(columns.values(), cls.__csv_types, zip(*splitted)):
+            column.extend(map(cast, values))
+
     def get_next_data_line(self):
         """Read next data from file
         Yields:
@@ -361,6 +1840,190 @@ class Ratings:
                 yield self.__parse_line(line)
                 line = file.readline()          # data line
 
+    def get_columns(self):
+        """Load all data from file into typed columns.
+        File is parsed only once, all reports share the result
+        and parsed columns are cached on disk (see `ColumnCache`).
+        Returns:
+            dict where the keys are csv headers and the values are arrays,
+            ratings are stored as codes (see `RatingCodes`)
+        """
+        if self.__columns is None:
+            if self.use_cache:
+                self.__columns = ColumnCache(self.filename).get_columns(self.__read_columns)
+            else:
+                self.__columns = self.__read_columns()
+        return self.__columns
+
+    @classmethod
+    def parse_lines(cls, lines: list):
+        """Parse data lines into typed columns
+        Returns:
+            dict where the keys are csv headers and the values are arrays
+        """
+        columns = cls.__new_columns()
+        cls.__extend_columns(columns, lines)
+        return columns
+
+    def __read_columns(self):
+        columns = self.__new_columns()
+
+        with open(self.filename, 'r', encoding='utf-8') as file:
+            file.readline()                     # header line, ignore
+            lines = file.readlines(self.__read_batch_size)
+            while lines:
+                self.__extend_columns(columns, lines)
+                lines = file.readlines(self.__read_batch_size)
+
+        return columns
+
+    def get_matrix(self):
+        """Get user x movie matrix of ratings (see `RatingsMatrix`), built only once
+        """
+        if self.__matrix is None:
+            columns = self.get_columns()
+            self.__matrix = RatingsMatrix.from_columns(columns['userId'], columns['movieId'],
+                                                       columns['rating'])
+        return self.__matrix
+
+    def get_byte_ranges(self, parts: int, start: int = None, end: int = None):
+        """Split data lines of file into byte ranges, aligned to the lines beginnings
+        Args:
+            parts (int): number of ranges
+            start (int): beginning of a line to start from (the first data line by default)
+            end (int): end of the last range (the file size by default)
+        Returns:
+            list of (start, end) tuples
+        """
+        size = os.path.getsize(self.filename) if end is None else end
+        with open(self.filename, 'rb') as file:
+            if start is None:
+                file.readline()                 # header line, ignore
+                start = file.tell()
+            boundaries = [start]
+            step = (size - boundaries[0]) / parts
+            for index in range(1, parts):
+                file.seek(max(int(boundaries[0] + step * index) - 1, boundaries[-1]))
+                file.readline()                 # move to the beginning of the next line
+                boundaries.append(max(min(file.tell(), size), boundaries[-1]))
+            boundaries.append(size)
+
+        return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
+
+    @staticmethod
+    def scan_range(path_to_the_file: str, start: int, end: int):
+        """Parse lines in the byte range of file into aggregates
+        (runs in worker processes of `scan`).
+        Returns:
+            RatingsAggregates: aggregates of the lines
+        """
+        aggregates = RatingsAggregates()
+        with open(path_to_the_file, 'rb') as file:
+            file.seek(start)
+            remaining = end - start
+            tail = ''
+            while remaining > 0:
+                chunk = file.read(min(Ratings.__read_batch_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                lines = (tail + chunk.decode('utf-8')).split('\n')
+                tail = lines.pop()              # incomplete line, wait for the next chunk
+                aggregates.add_lines(lines)
+            aggregates.add_lines([tail])
+        return aggregates
+
+    def __scan_ranges(self, ranges: list):
+        starts = [start for start, _ in ranges]
+        ends = [end for _, end in ranges]
+
+        aggregates = RatingsAggregates()
+        if self.workers > 1:
+            with ProcessPoolExecutor(self.workers) as executor:
+                for part in executor.map(Ratings.scan_range, repeat(self.filename), starts, ends):
+                    aggregates.merge(part)
+        else:
+            for start, end in ranges:
+                aggregates.merge(Ratings.scan_range(self.filename, start, end))
+        self.scanned_bytes = sum(end - start for start, end in ranges)
+        return aggregates
+
+    def __get_lines_end(self):
+        # end of the last complete line, a line being appended now is left for the next scan
+        with open(self.filename, 'rb') as file:
+            end = file.seek(0, os.SEEK_END)
+            while end > 0:
+                file.seek(max(end - self.__read_batch_size, 0))
+                chunk = file.read(end - file.tell())
+                if b'\n' in chunk:
+                    return end - len(chunk) + chunk.rindex(b'\n') + 1
+                end -= len(chunk)
+        return 0
+
+    def __get_checksum(self, offset: int):
+        with open(self.filename, 'rb') as file:
+            file.seek(max(offset - self.__state_checksum_size, 0))
+            data = file.read(min(offset, self.__state_checksum_size))
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def __load_state(self, lines_end: int):
+        # saved state is valid while the data before its offset is the same
+        try:
+            with open(self.filename + self.state_suffix, 'r', encoding='utf-8') as file:
+                state = json.load(file)
+            if state['version'] != self.__state_version or not 0 < state['offset'] <= lines_end \
+                    or state['checksum'] != self.__get_checksum(state['offset']):
+                return None
+            return state['offset'], RatingsAggregates.from_dict(state['aggregates'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def __save_state(self, offset: int, aggregates: RatingsAggregates):
+        state = {'version': self.__state_version, 'offset': offset,
+                 'checksum': self.__get_checksum(offset), 'aggregates': aggregates.to_dict()}
+        state_filename = self.filename + self.state_suffix
+        tmp_filename = f'{state_filename}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_filename, 'w', encoding='utf-8') as file:
+                json.dump(state, file)
+            os.replace(tmp_filename, state_filename)
+        except OSError:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+
+    def __scan_incremental(self):
+        lines_end = self.__get_lines_end()
+        state = self.__load_state(lines_end)
+        if state is None:                       # no state, or file was truncated or rewritten
+            offset, aggregates = None, RatingsAggregates()
+        else:
+            offset, aggregates = state
+
+        ranges = self.get_byte_ranges(max(self.workers, 1), offset, lines_end)
+        aggregates.merge(self.__scan_ranges(ranges))
+        if ranges or offset is None:
+            self.__save_state(ranges[-1][1] if ranges else lines_end, aggregates)
+        return aggregates
+
+    def scan(self):
+        """Aggregate all data of file in `workers` parallel processes (only on the first call).
+        File is split into byte ranges, every process aggregates its range
+        and partial aggregates are merged. A line being appended now (without a line break)
+        is left for the next scan.
+        In `incremental` mode aggregates are saved next to the file with the offset of the
+        processed data, so the next scan parses only lines appended after it
+        (file is scanned from the beginning if it was truncated or rewritten).
+        Returns:
+            RatingsAggregates: aggregates of all data lines
+        """
+        if self.__aggregates is None:
+            if self.incremental:
+                self.__aggregates = self.__scan_incremental()
+            else:
+                ranges = self.get_byte_ranges(max(self.workers, 1), end=self.__get_lines_end())
+                self.__aggregates = self.__scan_ranges(ranges)
+        return self.__aggregates
+
     class Movies:
         """Analyzing movies data from ratings.csv
         """
@@ -380,11 +2043,11 @@ class Ratings:
             Returns:
                 dict: a dict where the keys are years and the values are counts of ratings
             """
-            years_distribution = Counter()
-
-            for data in self.ratings.get_next_data_line():
-                year = datetime.fromtimestamp(data[3]).year
-                years_distribution[year] += 1
+            if self.ratings.use_scan():
+                years_distribution = self.ratings.scan().years
+            else:
+                timestamps = self.ratings.get_columns()['timestamp']
+                years_distribution = CalendarBuckets('year').count(timestamps)
 
             return dict(sorted(years_distribution.items()))
 
@@ -397,10 +2060,10 @@ class Ratings:
             Returns:
                 dict: a dict where the keys are ratings and the values are counts
             """
-            ratings_distribution = Counter()
-
-            for data in self.ratings.get_next_data_line():
-                ratings_distribution[data[2]] += 1
+            if self.ratings.use_scan():
+                ratings_distribution = self.ratings.scan().ratings
+            else:
+                ratings_distribution = RatingCodes.distribution(self.ratings.get_columns()['rating'])
 
             return dict(sorted(ratings_distribution.items()))
 
@@ -412,12 +2075,17 @@ class Ratings:
             Returns:
                 dict: a dict where the keys are movie titles and the values are numbers
             """
-            top_movies = Counter()
-
-            for data in self.ratings.get_next_data_line():
-                top_movies[self.movies_cls.get_movie_title(data[1])] += 1
+            if self.ratings.use_scan():
+                # sorted by movieId, so ties are in the same order as columns of the matrix
+                movies_counts = sorted((movie_id, statistics.count) for movie_id, statistics
+                                       in self.ratings.scan().movies_statistics.items())
+            else:
+                matrix = self.ratings.get_matrix()
+                movies_counts = zip(matrix.col_ids, matrix.col_counts())
+            top_movies = top_n(movies_counts, top_size)
+            titles = self.movies_cls.get_movie_titles(movie_id for movie_id, _ in top_movies)
 
-            return dict(top_movies.most_common(top_size))
+            return {title: count for title, (_, count) in zip(titles, top_movies)}
 
         def top_by_ratings(self, n, metric=Statistics.average):
             """
@@ -427,15 +2095,19 @@ class Ratings:
             Returns:
                 dict: a dict where the keys are movie titles and the values are metric values
             """
-            all_movies = defaultdict(list)
-
-            for data in self.ratings.get_next_data_line():
-                all_movies[self.movies_cls.get_movie_title(data[1])].append(data[2])
+            if self.ratings.use_scan():
+                all_movies = RatingsAggregates.aggregate(self.ratings.scan().movies_histograms, metric)
+            else:
+                columns = self.ratings.get_columns()
+                all_movies = GroupStatistics(columns['movieId'], columns['rating'],
+                                             RatingCodes.decode).aggregate(metric)
 
-            for movie in all_movies:
-                all_movies[movie] = round(metric(all_movies[movie]), 2)
+            for movie_id in all_movies:
+                all_movies[movie_id] = round(all_movies[movie_id], 2)
 
-            return dict(sorted(all_movies.items(), key=lambda item: item[1], reverse=True)[:n])
+            top_movies = top_n(all_movies.items(), n)
+            titles = self.movies_cls.get_movie_titles(movie_id for movie_id, _ in top_movies)
+            return {title: value for title, (_, value) in zip(titles, top_movies)}
 
         def top_controversial(self, n):
             """
@@ -445,15 +2117,20 @@ class Ratings:
             Returns:
                 dict: a dict where the keys are movie titles and the values are the variances
             """
-            all_movies = defaultdict(list)
-
-            for data in self.ratings.get_next_data_line():
-                all_movies[self.movies_cls.get_movie_title(data[1])].append(data[2])
+            if self.ratings.use_scan():
+                all_movies = {movie_id: statistics.variance() for movie_id, statistics
+                              in self.ratings.scan().movies_statistics.items()}
+            else:
+                columns = self.ratings.get_columns()
+                all_movies = GroupStatistics(columns['movieId'], columns['rating'],
+                                             RatingCodes.decode).variance()
 
-            for movie in all_movies:
-                all_movies[movie] = round(Statistics.variance(all_movies[movie]), 2)
+            for movie_id in all_movies:
+                all_movies[movie_id] = round(all_movies[movie_id], 2)
 
-            return dict(sorted(all_movies.items(), key=lambda item: item[1], reverse=True)[:n])
+            top_movies = top_n(all_movies.items(), n)
+            titles = self.movies_cls.get_movie_titles(movie_id for movie_id, _ in top_movies)
+            return {title: value for title, (_, value) in zip(titles, top_movies)}
 
 
     class Users(Movies):
@@ -467,10 +2144,11 @@ class Ratings:
             Returns:
                 dict: a dict where the keys are users and the values are number of ratings
             """
-            ratings_distribution = Counter()
-
-            for data in self.ratings.get_next_data_line():
-                ratings_distribution[data[0]] += 1
+            if self.ratings.use_scan():
+                ratings_distribution = self.ratings.scan().users
+            else:
+                matrix = self.ratings.get_matrix()
+                ratings_distribution = dict(zip(matrix.row_ids, matrix.row_counts()))
 
             return dict(sorted(ratings_distribution.items(), key=lambda item: item[1]))
 
@@ -482,13 +2160,18 @@ class Ratings:
             Returns:
                 dict: a dict where the keys are users and the values are metric of ratings
             """
-            all_ratings = defaultdict(list)
-
-            for data in self.ratings.get_next_data_line():
-                all_ratings[data[0]].append(data[2])
+            if self.ratings.use_scan():
+                all_ratings = RatingsAggregates.aggregate(self.ratings.scan().users_histograms, metric)
+            else:
+                matrix = self.ratings.get_matrix()
+                if metric is Statistics.average:
+                    values = matrix.row_means()
+                else:
+                    values = [metric(matrix.get_row(row)[1]) for row in range(matrix.shape[0])]
+                all_ratings = dict(zip(matrix.row_ids, values))
 
             for user in all_ratings:
-                all_ratings[user] = round(metric(all_ratings[user]), 2)
+                all_ratings[user] = round(all_ratings[user], 2)
 
             return dict(sorted(all_ratings.items(), key=lambda item: item[1]))
 
@@ -500,49 +2183,398 @@ class Ratings:
             Returns:
                 dict: a dict where the keys are users and the values are the variances
             """
-            all_ratings = defaultdict(list)
-
-            for data in self.ratings.get_next_data_line():
-                all_ratings[data[1]].append(data[2])
+            if self.ratings.use_scan():
+                all_ratings = {user_id: statistics.variance() for user_id, statistics
+                               in self.ratings.scan().users_statistics.items()}
+            else:
+                columns = self.ratings.get_columns()
+                all_ratings = GroupStatistics(columns['userId'], columns['rating'],
+                                              RatingCodes.decode).variance()
 
             for user in all_ratings:
-                all_ratings[user] = round(Statistics.variance(all_ratings[user]), 2)
+                all_ratings[user] = round(all_ratings[user], 2)
+
+            return dict(top_n(all_ratings.items(), n))
+
+
+
+#-------------------------------#
+#          Genres class         #
+#-------------------------------#
+
+class Genres:
+    """
+    Analyzing genres of movies.csv together with ratings.csv
+    """
+    def __init__(self, ratings_cls: Ratings, movies_cls: Movies):
+        if not isinstance(ratings_cls, Ratings):
+            raise ValueError('invalid Ratings class object')
+        if not isinstance(movies_cls, Movies):
+            raise ValueError('invalid Movies class object')
+        self.ratings = ratings_cls
+        self.movies_cls = movies_cls
+
+    def __get_bits(self, mask: int):
+        return [bit for bit in range(len(self.movies_cls.genres_vocabulary)) if mask >> bit & 1]
+
+    def cooccurrence(self):
+        """
+        The method returns the genre x genre co-occurrence matrix: a dict where the keys are genres
+        and the values are dicts where the keys are genres and the values are numbers of movies
+        with both genres (the diagonal is the number of movies with the genre).
+        """
+        vocabulary = self.movies_cls.genres_vocabulary
+        matrix = [[0] * len(vocabulary) for _ in vocabulary]
+
+        for mask, count in Counter(self.movies_cls.genres_masks).items():
+            bits = self.__get_bits(mask)
+            for first in bits:
+                for second in bits:
+                    matrix[first][second] += count
 
-            return dict(sorted(all_ratings.items(), key=lambda item: item[1], reverse=True)[:n])
+        return {genre: dict(zip(vocabulary, row)) for genre, row in zip(vocabulary, matrix)}
 
+    def rating_statistics(self):
+        """
+        The method returns count, average and variance of the ratings of movies of every genre,
+        sorted by counts descendingly.
+
+        Returns:
+            dict: a dict where the keys are genres and the values are
+            dicts with 'count', 'average' and 'variance' keys
+        """
+        # statistics per movie in one pass over ratings, then merged per combination of genres
+        if self.ratings.use_scan():
+            movies_statistics = self.ratings.scan().movies_statistics
+        else:
+            columns = self.ratings.get_columns()
+            movies_statistics = GroupStatistics(columns['movieId'], columns['rating'],
+                                                RatingCodes.decode).running()
+
+        movies_masks = dict(zip(self.movies_cls.get_columns()['movieId'],
+                                self.movies_cls.genres_masks))
+        masks_statistics = defaultdict(RunningStatistics)
+        for movie_id, statistics in movies_statistics.items():
+            masks_statistics[movies_masks.get(movie_id, 0)].merge(statistics)
+
+        vocabulary = self.movies_cls.genres_vocabulary
+        genres_statistics = [RunningStatistics() for _ in vocabulary]
+        for mask, statistics in masks_statistics.items():
+            for bit in self.__get_bits(mask):
+                genres_statistics[bit].merge(statistics)
+
+        result = {genre: {'count': statistics.count,
+                          'average': round(statistics.average(), 2),
+                          'variance': round(statistics.variance(), 2)}
+                  for genre, statistics in zip(vocabulary, genres_statistics)
+                  if statistics.count}
+        return dict(sorted(result.items(), key=lambda item: item[1]['count'], reverse=True))
+
+
+#-------------------------------#
+#     ItemSimilarity class      #
+#-------------------------------#
+
+class ItemSimilarity:
+    """
+    Item-item similarity of movies by ratings of the same users:
+    'cosine' of ratings vectors or 'pearson' (cosine of ratings centred by average rating of movie).
+
+    Top-k neighbours of all movies are computed by sparse multiplication in blocks of movies
+    (blocks run in `workers` parallel processes if more than 1), memory is bounded by
+    one accumulator per movie of block and k neighbours per movie.
+    Neighbours are saved next to ratings file and memory-mapped on load (see `ColumnCache`),
+    so "movies like X" is a lookup of k values.
+    """
+    metrics = ('cosine', 'pearson')
+    null_id = -1                        # neighbour id of movies with less than k neighbours
+    worker_state = None                 # state of worker process, sent once (see `init_worker`)
+
+    def __init__(self, ratings_cls: Ratings, movies_cls: Movies, metric: str = 'cosine',
+                 k: int = 10, block_size: int = 256, workers: int = 1, use_cache=True):
+        if not isinstance(ratings_cls, Ratings):
+            raise ValueError('invalid Ratings class object')
+        if not isinstance(movies_cls, Movies):
+            raise ValueError('invalid Movies class object')
+        if metric not in self.metrics:
+            raise ValueError(f'unknown metric: {metric}')
+        self.ratings = ratings_cls
+        self.movies_cls = movies_cls
+        self.metric = metric
+        self.k = k
+        self.block_size = block_size
+        self.workers = workers
+        self.use_cache = use_cache
+        self.__neighbours = None
+
+    def __get_state(self):
+        # values of user x movie and movie x user matrices (centred for pearson) and norms of movies
+        users_matrix = self.ratings.get_matrix()
+        movies_matrix = users_matrix.transpose()
+        means = movies_matrix.row_means() if self.metric == 'pearson' \
+            else [0.0] * movies_matrix.shape[0]
+
+        users_values = array('d', (RatingCodes.decode(code) - means[movie]
+                                   for movie, code in zip(users_matrix.indices, users_matrix.data)))
+        movies_values = array('d')
+        norms = array('d')
+        indptr = movies_matrix.indptr
+        for movie, (start, end) in enumerate(zip(indptr, islice(indptr, 1, None))):
+            values = [RatingCodes.decode(code) - means[movie] for code in movies_matrix.data[start:end]]
+            movies_values.extend(values)
+            norms.append(math.sqrt(sum(value * value for value in values)))
+
+        return (users_matrix.indptr, users_matrix.indices, users_values,
+                movies_matrix.indptr, movies_matrix.indices, movies_values,
+                norms, users_matrix.col_ids, self.k)
+
+    @staticmethod
+    def init_worker(state: tuple):
+        """Keep state in worker process, so tasks of `compute_block` send only ranges of movies
+        """
+        ItemSimilarity.worker_state = state
 
+    @staticmethod
+    def compute_block(start: int, end: int, state: tuple = None):
+        """Compute top-k neighbours of movies (indexes of columns) from start to end
+        (runs in worker processes of `get_neighbours` with `worker_state` by default).
+        Returns:
+            tuple of arrays of neighbours ids and similarities, k values per movie
+        """
+        if state is None:
+            state = ItemSimilarity.worker_state
+        (users_indptr, users_indices, users_values,
+         movies_indptr, movies_indices, movies_values, norms, movie_ids, k) = state
+        neighbours, scores = array('i'), array('f')
+
+        for movie in range(start, end):
+            norm = norms[movie]
+            products = defaultdict(float)
+            if norm:
+                movie_start, movie_end = movies_indptr[movie], movies_indptr[movie + 1]
+                for user, value in zip(movies_indices[movie_start:movie_end],
+                                       movies_values[movie_start:movie_end]):
+                    user_start, user_end = users_indptr[user], users_indptr[user + 1]
+                    for other, other_value in zip(users_indices[user_start:user_end],
+                                                  users_values[user_start:user_end]):
+                        products[other] += value * other_value
+                products.pop(movie, None)
+
+            top = top_n(((other, product / (norm * norms[other]))
+                         for other, product in products.items() if norms[other]), k)
+            top += [(None, 0.0)] * (k - len(top))
+            neighbours.extend(movie_ids[other] if other is not None else ItemSimilarity.null_id
+                              for other, _ in top)
+            scores.extend(score for _, score in top)
+
+        return neighbours, scores
+
+    def __compute_neighbours(self):
+        state = self.__get_state()
+        movie_ids = state[7]
+        starts = range(0, len(movie_ids), self.block_size)
+        ends = [min(start + self.block_size, len(movie_ids)) for start in starts]
+
+        columns = {'movieId': array('i', movie_ids), 'neighbours': array('i'), 'scores': array('f')}
+        if self.workers > 1:
+            with ProcessPoolExecutor(self.workers, initializer=ItemSimilarity.init_worker,
+                                     initargs=(state,)) as executor:
+                parts = list(executor.map(ItemSimilarity.compute_block, starts, ends))
+        else:
+            parts = map(ItemSimilarity.compute_block, starts, ends, repeat(state))
+        for neighbours, scores in parts:
+            columns['neighbours'].extend(neighbours)
+            columns['scores'].extend(scores)
+        return columns
+
+    def get_neighbours(self):
+        """Get top-k neighbours of all movies (computed only once, cached on disk)
+        Returns:
+            dict where the keys are 'movieId' (sorted), 'neighbours' and 'scores'
+            (k values per movie, neighbours ids are `null_id` if there are less than k of them)
+        """
+        if self.__neighbours is None:
+            if self.use_cache:
+                cache = ColumnCache(self.ratings.filename, suffix=f'.{self.metric}-{self.k}.neighbours')
+                self.__neighbours = cache.get_columns(self.__compute_neighbours)
+            else:
+                self.__neighbours = self.__compute_neighbours()
+        return self.__neighbours
+
+    def similar(self, movie_id: int, n: int = None):
+        """Get the most similar movies
+        Args:
+            movie_id (int): id of movie
+            n (int): number of movies, at most k (k by default)
+        Returns:
+            list of (movieId, similarity) pairs sorted by similarity descendingly
+            (empty if movie has no ratings)
+        """
+        neighbours = self.get_neighbours()
+        movie_ids = neighbours['movieId']
+        row = bisect_left(movie_ids, movie_id)
+        if row == len(movie_ids) or movie_ids[row] != movie_id:
+            return []
+        start = row * self.k
+        end = start + min(n if n is not None else self.k, self.k)
+        return [(other, score) for other, score
+                in zip(neighbours['neighbours'][start:end], neighbours['scores'][start:end])
+                if other != self.null_id]
+
+    def similar_titles(self, movie_id: int, n: int = None):
+        """
+        The method returns a dict with movies like the movie given as the argument,
+        where the keys are movie titles and the values are similarities rounded to 2 decimals.
+        Sort it by similarities descendingly.
+        """
+        similar = self.similar(movie_id, n)
+        titles = self.movies_cls.get_movie_titles([other for other, _ in similar])
+        return {title: round(score, 2) for title, (_, score) in zip(titles, similar)}
 
 #-------------------------------#
 #          Tags class           #
 #-------------------------------#
 
+class TagIndex:
+    """
+    Search index over unique tags, built once:
+    sorted table of unique tags, table of their lowercase forms,
+    postings of words and of character n-grams of lowercase forms.
+    """
+    gram_size = 3
+    __word_pattern = re.compile(r'\w+')
+
+    def __init__(self, tags):
+        self.tags = sorted(set(tags))           # ids of tags are ordered as tags are
+        lowered = {}                            # lowercase form -> ids of tags
+        for tag_id, tag in enumerate(self.tags):
+            lowered.setdefault(tag.lower(), array('i')).append(tag_id)
+        self.lowered = list(lowered)
+        self.__lowered_tags = list(lowered.values())
+
+        # postings are arrays of lowercase ids, sorted as they are appended in order
+        self.__words = defaultdict(partial(array, 'i'))
+        self.__grams = defaultdict(partial(array, 'i'))
+        size = self.gram_size
+        for lowered_id, text in enumerate(self.lowered):
+            for word in set(self.__word_pattern.findall(text)):
+                self.__words[word].append(lowered_id)
+            for gram in {text[index:index + size] for index in range(len(text) - size + 1)}:
+                self.__grams[gram].append(lowered_id)
+
+    @staticmethod
+    def __intersect(postings: list):
+        if not postings:
+            return set()
+        postings = sorted(postings, key=len)
+        return set(postings[0]).intersection(*postings[1:])
+
+    def __get_tags(self, lowered_ids):
+        return [self.tags[tag_id]
+                for tag_id in sorted(tag_id for lowered_id in lowered_ids
+                                     for tag_id in self.__lowered_tags[lowered_id])]
+
+    def find(self, text: str):
+        """Find tags which include text (case insensitive)
+        Returns:
+            list of tags sorted alphabetically
+        """
+        text = text.lower()
+        size = self.gram_size
+        if len(text) < size:                    # too short for n-grams, check all unique tags
+            candidates = range(len(self.lowered))
+        else:
+            candidates = self.__intersect([self.__grams.get(text[index:index + size], ())
+                                           for index in range(len(text) - size + 1)])
+        lowered = self.lowered
+        return self.__get_tags(lowered_id for lowered_id in candidates
+                               if text in lowered[lowered_id])
+
+    def find_words(self, text: str):
+        """Find tags which include text as whole words (case insensitive)
+        Returns:
+            list of tags sorted alphabetically
+        """
+        text = text.lower()
+        words = self.__word_pattern.findall(text)
+        candidates = self.__intersect([self.__words.get(word, ()) for word in words])
+        lowered = self.lowered
+        return self.__get_tags(lowered_id for lowered_id in candidates
+                               if text in lowered[lowered_id])
+
+
+class TagFeatures:
+    """
+    Table of features of unique tags (in order of first occurrence), built in one pass:
+    number of characters, number of words and frequency of every tag.
+    """
+    __word_pattern = re.compile(r'\w+')
+
+    def __init__(self, tags):
+        frequencies = Counter(tags)
+        self.tags = list(frequencies)
+        self.frequencies = array('i', frequencies.values())
+        self.lengths = array('i', map(len, self.tags))
+        self.words = array('i', (len(self.__word_pattern.findall(tag)) for tag in self.tags))
+
+    def top(self, column, n: int):
+        """Get top-n tags by feature column (for example `lengths`)
+        Returns:
+            list of (tag, value) pairs sorted by values descendingly
+        """
+        return top_n(zip(self.tags, column), n)
+
+
 class Tags:
     """
     Analyzing data from tags.csv
     """
     __csv_headers = ('userId', 'movieId', 'tag', 'timestamp')
-    __csv_separator = ','
     __csv_types = (int, int, str, int)
+    __csv_typecodes = ('i', 'i', None, 'q')
 
-    def __init__(self, path_to_the_file: str):
+    def __init__(self, path_to_the_file: str, use_cache=True):
         self.filename = path_to_the_file
-
-    def __parse_line(self, data_line: str):
-        splitted = data_line.split(self.__csv_separator)
-        return [self.__csv_types[index](splitted[index])
-                for index in range(len(self.__csv_headers))]
+        self.use_cache = use_cache
+        self.__columns = None
+        self.__index = None
+        self.__features = None
 
     def get_next_data_line(self):
         """Read next data from file
         Yields:
             list with parsed values
         """
-        with open(self.filename, 'r', encoding='utf-8') as file:
-            line = file.readline()  # header line, ignore
-            line = file.readline()  # first data line
-            while line:
-                yield self.__parse_line(line)
-                line = file.readline()  # data line
+        # tags with commas and quotes are quoted by RFC 4180 rules
+        with open(self.filename, 'r', encoding='utf-8', newline='') as file:
+            reader = csv.reader(file)
+            next(reader, None)                  # header line, ignore
+            for row in reader:
+                yield [cast(value) for cast, value in zip(self.__csv_types, row)]
+
+    def get_columns(self):
+        """Get all data from file as columns.
+        File is parsed only once, parsed columns are cached on disk (see `ColumnCache`).
+        Returns:
+            dict where the keys are csv headers and the values are columns
+        """
+        if self.__columns is None:
+            if self.use_cache:
+                self.__columns = ColumnCache(self.filename).get_columns(self.__read_columns)
+            else:
+                self.__columns = self.__read_columns()
+        return self.__columns
+
+    def __read_columns(self):
+        return ColumnCache.columns_from_rows(self.get_next_data_line(),
+                                             self.__csv_headers, self.__csv_typecodes)
+
+    def get_features(self):
+        """Get table of features of unique tags (see `TagFeatures`), built only once
+        """
+        if self.__features is None:
+            self.__features = TagFeatures(self.get_columns()['tag'])
+        return self.__features
 
     def most_words(self, n):
         """
@@ -553,13 +2585,8 @@ class Tags:
                 dict: a dict where the keys are tags
                 and the values are the number of words inside the tag
         """
-        all_tags = {}
-
-        for data in self.get_next_data_line():
-            if data[2] not in all_tags:
-                all_tags[data[2]] = len(re.findall(r'\b', data[2]))
-
-        return dict(sorted(all_tags.items(), key=lambda item: item[1], reverse=True)[:n])
+        features = self.get_features()
+        return dict(features.top(features.words, n))
 
     def longest(self, n):
         """
@@ -569,14 +2596,8 @@ class Tags:
             Returns:
                 list: list of the longest tags
         """
-        all_tags = {}
-
-        for data in self.get_next_data_line():
-            if data[2] not in all_tags:
-                all_tags[data[2]] = len(data[2])
-        all_tags = dict(sorted(all_tags.items(), key=lambda item: item[1], reverse=True)[:n])
-
-        return list(all_tags.keys())[:n]
+        features = self.get_features()
+        return [tag for tag, _ in features.top(features.lengths, n)]
 
     def most_words_and_longest(self, n):
         """
@@ -584,42 +2605,40 @@ class Tags:
         top-n longest tags in terms of the number of characters.
         Drop the duplicates. It is a list of the tags.
         """
-        big_tags = list(self.most_words(n).keys())
-        long_tags = self.longest(n)
-        for value in long_tags:
-            if value not in big_tags:
-                big_tags.append(value)
+        features = self.get_features()
+        big_tags = [tag for tag, _ in features.top(features.words, n)]
+        long_tags = [tag for tag, _ in features.top(features.lengths, n)]
+        return list(dict.fromkeys(big_tags + long_tags))
 
-        return big_tags
-
-    def most_popular(self, n):
+    def most_popular(self, n, sketch: CountMinSketch = None):
         """
         The method returns the most popular tags. 
         It is a dict where the keys are tags and the values are the counts.
         Drop the duplicates. Sort it by counts descendingly.
+        Tags are compared case insensitively (keys are case-folded tags).
+        With `sketch` counts are estimated in bounded memory (see `CountMinSketch`).
         """
-        all_tags = []
-
-        for data in self.get_next_data_line():
-            if data[2] not in all_tags:
-                all_tags.append(data[2].lower())
-        popular_tags = dict(Counter(all_tags).most_common(n))
+        tags = map(str.casefold, self.get_columns()['tag'])
+        if sketch is not None:
+            return dict(sketch.copy_empty().most_common(tags, n))
+        return dict(Counter(tags).most_common(n))
 
-        return popular_tags
+    def get_index(self):
+        """Get search index of unique tags (see `TagIndex`), built only once
+        """
+        if self.__index is None:
+            self.__index = TagIndex(self.get_columns()['tag'])
+        return self.__index
 
-    def tags_with(self, word):
+    def tags_with(self, word, whole_word=False):
         """
         The method returns all unique tags that include the word given as the argument.
         Drop the duplicates. It is a list of the tags. Sort it by tag names alphabetically.
+        With `whole_word` only tags where the word is not a part of a longer word are returned.
         """
-        tags_with_word = []
-
-        for data in self.get_next_data_line():
-            if word.lower() in data[2].lower():
-                if data[2] not in tags_with_word:
-                    tags_with_word.append(data[2])
-
-        return sorted(tags_with_word)
+        if whole_word:
+            return self.get_index().find_words(word)
+        return self.get_index().find(word)
 
 
 
@@ -630,6 +2649,77 @@ class Tags:
 class Tests:
     """Tests class
     """
+    class TestTopN:
+        """Tests for top_n function
+        """
+        def test__top_n__same_as_sorted(self):
+            items = [('a', 3), ('b', 5), ('c', 3), ('d', 1), ('e', 5), ('f', 3)]
+            for n in range(len(items) + 2):
+                assert top_n(items, n) == sorted(items, key=lambda item: item[1], reverse=True)[:n]
+
+        def test__top_n__key(self):
+            assert top_n(['bb', 'a', 'ccc'], 2, key=len) == ['ccc', 'bb']
+
+    class TestColumnCache:
+        """Tests for ColumnCache class
+        """
+        @staticmethod
+        def create_csv(tmp_path):
+            filename = str(tmp_path / 'data.csv')
+            with open(filename, 'w', encoding='utf-8') as file:
+                file.write('id,name\n1,first\n2,second\n')
+            return filename
+
+        @staticmethod
+        def read_columns():
+            return {'id': array('i', [1, 2]), 'name': ['first', 'second']}
+
+        def test__get_columns__roundtrip(self, tmp_path):
+            cache = ColumnCache(self.create_csv(tmp_path))
+            assert cache.load() is None
+
+            cache.get_columns(self.read_columns)
+            result = cache.load()
+
+            # numeric columns are memory-mapped, text columns are lists
+            assert isinstance(result['id'], memoryview)
+            assert list(result['id']) == [1, 2]
+            assert result['name'] == ['first', 'second']
+
+        def test__load__outdated(self, tmp_path):
+            filename = self.create_csv(tmp_path)
+            cache = ColumnCache(filename)
+            cache.save(self.read_columns())
+
+            with open(filename, 'a', encoding='utf-8') as file:
+                file.write('3,third\n')
+            assert cache.load() is None
+
+        def test__get_columns__broken_cache(self, tmp_path):
+            filename = self.create_csv(tmp_path)
+            cache = ColumnCache(filename)
+
+            for size in (-3, 20, 0):            # in the data, in the header, empty
+                cache.save({'name': ['first', 'second'], 'id': array('i', range(100))})
+                with open(cache.cache_filename, 'r+b') as file:
+                    file.truncate(size if size >= 0 else file.seek(0, os.SEEK_END) + size)
+                assert cache.load() is None
+                assert cache.get_columns(self.read_columns)['name'] == ['first', 'second']
+                assert list(cache.load()['id']) == [1, 2]
+
+        def test__get_columns__changed_while_parsing(self, tmp_path):
+            filename = self.create_csv(tmp_path)
+            cache = ColumnCache(filename)
+
+            def read_columns():
+                columns = self.read_columns()
+                with open(filename, 'a', encoding='utf-8') as file:
+                    file.write('3,third\n')
+                return columns
+
+            assert cache.get_columns(read_columns)['name'] == ['first', 'second']
+            assert cache.load() is None
+
     class TestMovies:
         """Tests for Movies class
         """
@@ -652,6 +2742,17 @@ class Tests:
             result = self.mov.dist_by_release()
             assert isinstance(result, dict)
 
+        def test__dist_by_release_same_as_index(self):
+            result = self.mov.dist_by_release()
+            for year, movie_ids in self.mov.movies_by_release.items():
+                key = 'Null' if year == Movies.null_year else str(year)
+                assert result[key] == len(movie_ids)
+
+        def test__get_movies_released_check_result(self):
+            result = self.mov.get_movies_released(1995, 1995)
+            assert 5 in result and len(result) == self.mov.dist_by_release()['1995']
+            assert self.mov.get_movies_released(1996, 1995) == []
+
         def test__dist_by_genres_sorted(self):
             result = self.mov.dist_by_genres()
             genres = list(result.values())
@@ -680,6 +2781,19 @@ class Tests:
             result = self.mov.most_genres(10)
             assert isinstance(result, dict)
 
+        def test__get_movies_with_genres_check_result(self):
+            # movie 1 is Adventure|Animation|Children|Comedy|Fantasy
+            result = self.mov.get_movies_with_genres(['Animation', 'Fantasy'])
+            assert 1 in result and 2 not in result
+            assert len(result) <= self.mov.dist_by_genres()['Animation']
+
+            result = self.mov.get_movies_with_genres(['Animation', 'Fantasy'], match_all=False)
+            assert 1 in result and 2 in result
+
+        def test__get_genres_mask_unknown(self):
+            with pytest.raises(ValueError):
+                self.mov.get_genres_mask(['Unknown genre'])
+
         def test_get_movie_title_type(self):
             result = self.mov.get_movie_title(8)
             assert isinstance(result, str)
@@ -689,6 +2803,293 @@ class Tests:
 
         def test_get_movie_title_incorrect_id(self):
             assert self.mov.get_movie_title(98222222222222222222222222523) is None
+            assert self.mov.get_movie_title(-1) is None
+
+        def test_get_movie_titles_check_result(self):
+            result = self.mov.get_movie_titles([5, 4, -5, 98222222222222222222222222523, 5])
+            assert result == ['Father of the Bride Part II (1995)', 'Waiting to Exhale (1995)',
+                              None, None, 'Father of the Bride Part II (1995)']
+
+        def test_get_movie_title_quoted(self):
+            assert self.mov.get_movie_title(11) == 'American President, The (1995)'
+            assert self.mov.get_movie_title(7789) == '11\'09"01 - September 11 (2002)'
+
+        def test__get_next_data_line__same_as_columns(self):
+            columns = self.mov.get_columns()
+            for index, data in enumerate(self.mov.get_next_data_line()):
+                assert data == [column[index] for column in columns.values()]
+
+    class TestImdbFetcher:
+        """Tests for ImdbFetcher class with local stub HTTP server
+        """
+        class StubHandler(BaseHTTPRequestHandler):
+            requests_counts = Counter()
+            active_requests = [0, 0]        # current, maximum
+            lock = threading.Lock()
+
+            def do_GET(self):
+                imdb_id = self.path.rsplit('tt', 1)[-1]
+                with self.lock:
+                    self.requests_counts[imdb_id] += 1
+                    attempt = self.requests_counts[imdb_id]
+                    self.active_requests[0] += 1
+                    self.active_requests[1] = max(self.active_requests)
+                time.sleep(0.01)
+                with self.lock:
+                    self.active_requests[0] -= 1
+
+                if imdb_id == 'missing':
+                    status = 404
+                elif imdb_id == 'unstable' and attempt < 3:
+                    status = 503
+                else:
+                    status = 200
+                body = f'page {imdb_id}'.encode()
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        @classmethod
+        def setup_class(cls):
+            cls.server = ThreadingHTTPServer(('127.0.0.1', 0), cls.StubHandler)
+            threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+            cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}/title/tt'
+
+        @classmethod
+        def teardown_class(cls):
+            cls.server.shutdown()
+            cls.server.server_close()
+
+        def test__fetch__pages(self):
+            fetcher = ImdbFetcher(self.base_url, concurrency=4, requests_per_second=1000)
+            imdb_ids = [f'{index:07d}' for index in range(20)]
+            result = fetcher.fetch(imdb_ids + imdb_ids[:5])
+
+            assert list(result.keys()) == imdb_ids
+            assert all(result[imdb_id] == f'page {imdb_id}' for imdb_id in imdb_ids)
+            assert 1 < self.StubHandler.active_requests[1] <= 4
+
+        def test__fetch__retries(self):
+            fetcher = ImdbFetcher(self.base_url, requests_per_second=1000, retries=3, backoff=0.01)
+            result = fetcher.fetch(['unstable', 'missing'])
+
+            assert result == {'unstable': 'page unstable', 'missing': None}
+            assert self.StubHandler.requests_counts['unstable'] == 3
+            assert self.StubHandler.requests_counts['missing'] == 1
+
+        def test__fetch__rate_limit(self):
+            fetcher = ImdbFetcher(self.base_url, concurrency=8, requests_per_second=50)
+            start = time.monotonic()
+            fetcher.fetch([f'rate{index}' for index in range(6)])
+            assert time.monotonic() - start >= 5 / 50
+
+    class TestImdbCache:
+        """Tests for ImdbCache class
+        """
+        def test__get_many__hits_and_misses(self, tmp_path):
+            cache = ImdbCache(str(tmp_path / 'imdb.sqlite'))
+            cache.put('0114709', {'Director': 'John Lasseter', 'Budget': None})
+
+            assert cache.get_many(['0114709', '0113497']) == \
+                   {'0114709': {'Director': 'John Lasseter', 'Budget': None}}
+            assert (cache.hits, cache.misses) == (1, 1)
+            cache.close()
+
+            # persistent between processes
+            cache = ImdbCache(str(tmp_path / 'imdb.sqlite'))
+            assert cache.get('0114709') == {'Director': 'John Lasseter', 'Budget': None}
+
+        def test__get__expired(self, tmp_path):
+            cache = ImdbCache(str(tmp_path / 'imdb.sqlite'), ttl=-1)
+            cache.put('0114709', {})
+            assert cache.get('0114709') is None
+            assert len(cache) == 0
+
+        def test__put__lru_eviction(self, tmp_path):
+            cache = ImdbCache(str(tmp_path / 'imdb.sqlite'), max_entries=2)
+            cache.put('1', {})
+            time.sleep(0.01)
+            cache.put('2', {})
+            time.sleep(0.01)
+            cache.get('1')          # '2' is least recently used now
+            time.sleep(0.01)
+            cache.put('3', {})
+
+            assert len(cache) == 2
+            assert cache.get('2') is None and cache.get('1') == {} and cache.get('3') == {}
+
+    @staticmethod
+    def make_imdb_page(fields: dict):
+        """Make page with the same structure of info block as IMDb title page
+        """
+        items = ''.join(
+            '<li role="presentation" class="ipc-metadata-list__item">'
+            f'<span class="ipc-metadata-list-item__label">{label}</span>'
+            f'<div class="ipc-metadata-list-item__content-container"><ul><li>{value}</li></ul></div>'
+            '</li>'
+            for label, value in fields.items())
+        containers = '<div class="ipc-page-content-container"></div>' * 5
+        return (f'<html><head><title>IMDb</title></head><body>{containers}'
+                f'<div class="ipc-page-content-container"><section><ul>{items}</ul></section></div>'
+                '</body></html>')
+
+    class StubFetcher:
+        """Fetcher of generated IMDb pages without network
+        """
+        def __init__(self, pages: dict):
+            self.pages = pages
+            self.requests_counts = Counter()
+
+        def fetch(self, imdb_ids):
+            imdb_ids = list(imdb_ids)
+            self.requests_counts.update(imdb_ids)
+            return {imdb_id: self.pages.get(imdb_id) for imdb_id in imdb_ids}
+
+    class TestImdbInfoParser:
+        """Stream parser must give the same fields as BeautifulSoup
+        """
+        def test__fixture_page__same_as_soup(self):
+            # synthetic page with the markup of IMDb title page: 5 containers before the info block
+            # (one with decoy items), nested lists, entities, void tags and a large tail
+            with open('./fixtures/imdb_title.html', 'r', encoding='utf-8') as file:
+                page = file.read()
+            result = Links.parse_imdb_page(page)
+            assert result == Links.parse_imdb_page(page, parser='soup')
+            assert result['Writers'] == 'John LasseterPete DocterAndrew Stanton'
+            assert result['Gross US & Canada'] == '$223,225,679'
+            assert result['Sound mix'] is None
+            assert 'Ignored 0' not in result
+
+        def test__generated_page__same_as_soup(self):
+            page = Tests.make_imdb_page({'Director': 'Joe Johnston', 'Runtime': '1 hour 44 minutes'})
+            result = Links.parse_imdb_page(page)
+            assert result == Links.parse_imdb_page(page, parser='soup')
+            assert result == {'Director': 'Joe Johnston', 'Runtime': '1 hour 44 minutes'}
+
+        def test__not_closed_item__same_as_soup(self):
+            page = Tests.make_imdb_page({'A': '1', 'B': '2', 'C': '3'})
+            page = page.replace('</div></li>', '</div>', 1)     # the first item is not closed
+            result = Links.parse_imdb_page(page)
+            assert result == Links.parse_imdb_page(page, parser='soup')
+            assert result == {'A': '1', 'B': '2', 'C': '3'}
+
+        def test__no_info_block__raises(self):
+            page = '<html><body><div class="ipc-page-content-container"></div></body></html>'
+            with pytest.raises(IndexError):
+                Links.parse_imdb_page(page)
+            with pytest.raises(IndexError):
+                Links.parse_imdb_page(page, parser='soup')
+
+        def test__unknown_parser__raises(self):
+            with pytest.raises(ValueError):
+                Links.parse_imdb_page('', parser='lxml')
+
+    class TestLinksOffline:
+        """Tests for Links class with generated IMDb pages
+        """
+        @classmethod
+        def setup_class(cls):
+            cls.mov = Movies('./ml-latest-small/movies.csv')
+            cls.fields = {
+                '0114709': {'Director': 'John Lasseter', 'Budget': '$30,000,000 (estimated)',
+                            'Gross worldwide': '$394,436,586', 'Runtime': '1 hour 21 minutes'},
+                '0113497': {'Director': 'Joe Johnston', 'Budget': '$65,000,000 (estimated)',
+                            'Gross worldwide': '$262,821,940', 'Runtime': '1 hour 44 minutes'},
+                '0113228': {'Director': 'Howard Deutch', 'Budget': '$25,000,000 (estimated)',
+                            'Gross worldwide': '$71,518,503', 'Runtime': '1 hour 41 minutes'},
+                '0114885': {'Director': 'Forest Whitaker', 'Budget': '$16,000,000 (estimated)',
+                            'Runtime': '2 hours 4 minutes'},
+                '0113041': {'Director': 'Charles Shyer'},
+                '0113277': {'Director': 'Michael Mann', 'Budget': '$60,000,000 (estimated)',
+                            'Gross worldwide': '$187,436,818', 'Runtime': '2 hours 50 minutes'},
+                '0114319': {'Director': 'Sydney Pollack', 'Budget': '$58,000,000 (estimated)',
+                            'Gross worldwide': '$53,696,959', 'Runtime': '2 hours 7 minutes'},
+                '0112302': {'Director': 'Peter Hewitt', 'Runtime': '1 hour 37 minutes'},
+                '0114576': {'Director': 'Peter Hyams', 'Budget': '$35,000,000 (estimated)',
+                            'Gross worldwide': '$64,350,171', 'Runtime': '1 hour 51 minutes'},
+                '0113189': {'Director': 'Martin Campbell', 'Budget': '$60,000,000 (estimated)',
+                            'Gross worldwide': '$352,194,034', 'Runtime': '2 hours 10 minutes'},
+            }
+            cls.fetcher = Tests.StubFetcher({imdb_id: Tests.make_imdb_page(fields)
+                                             for imdb_id, fields in cls.fields.items()})
+            cls.links = Links('./ml-latest-small/micro_links.csv', cls.mov,
+                              use_cache=False, fetcher=cls.fetcher)
+
+        def test__get_enrichment__fetched_once(self):
+            result = self.links.get_enrichment()
+            assert list(result['movieId']) == list(range(1, 11))
+            assert result['director'][0] == 'John Lasseter'
+            assert result['gross'][3] is None
+
+            self.links.top_directors(3)
+            self.links.most_expensive(3)
+            self.links.most_profitable(3)
+            self.links.longest(3)
+            self.links.top_cost_per_minute(3)
+            assert set(self.fetcher.requests_counts.values()) == {1}
+
+        def test__init__cache_not_writable(self, tmp_path):
+            links = Links(str(tmp_path / 'missing' / 'links.csv'), self.mov, fetcher=self.fetcher)
+            assert links.imdb_cache is None
+
+        def test__get_imdb__values(self):
+            result = self.links.get_imdb([1, 2], ['Director', 'Budget'])
+            assert result == [['1', 'John Lasseter', '$30,000,000 (estimated)'],
+                              ['2', 'Joe Johnston', '$65,000,000 (estimated)']]
+
+        def test__parse_money(self):
+            assert Links.parse_money('$30,000,000 (estimated)') == (30000000, 'USD')
+            assert Links.parse_money('€1,500,000') == (1500000, 'EUR')
+            assert Links.parse_money('FRF 50,000,000 (estimated)') == (50000000, 'FRF')
+            assert Links.parse_money(None) == (Links.null_number, None)
+            assert Links.parse_money('unknown') == (Links.null_number, None)
+
+        def test__parse_runtime(self):
+            assert Links.parse_runtime('2 hours 15 minutes') == 135
+            assert Links.parse_runtime('1 hour 1 minute') == 61
+            assert Links.parse_runtime('2 hours') == 120
+            assert Links.parse_runtime('45 minutes') == 45
+            assert Links.parse_runtime('1h 30m') == 90
+            assert Links.parse_runtime(None) == Links.null_number
+            assert Links.parse_runtime('unknown') == Links.null_number
+
+        def test__get_enrichment__numeric_columns(self):
+            result = self.links.get_enrichment()
+            assert result['budget_amount'].typecode == 'q'
+            assert result['runtime_minutes'].typecode == 'h'
+            assert result['budget_amount'][0] == 30000000
+            assert result['budget_currency'][0] == 'USD'
+            assert result['gross_amount'][3] == Links.null_number
+            assert result['gross_currency'][3] is None
+            assert result['runtime_minutes'][:2].tolist() == [81, 104]
+
+        def test__most_expensive__values(self):
+            result = self.links.most_expensive(2)
+            assert result == {'Jumanji (1995)': '$65,000,000 (estimated)',
+                              'Heat (1995)': '$60,000,000 (estimated)'}
+
+        def test__most_profitable__values(self):
+            result = self.links.most_profitable(2)
+            assert result == {'Toy Story (1995)': 364436586.0, 'GoldenEye (1995)': 292194034.0}
+
+        def test__longest__values(self):
+            result = self.links.longest(2)
+            assert result == {'Heat (1995)': '2 hours 50 minutes',
+                              'GoldenEye (1995)': '2 hours 10 minutes'}
+
+        def test__top_cost_per_minute__values(self):
+            result = self.links.top_cost_per_minute(1)
+            assert result == {'Jumanji (1995)': 625000.0}
+
+        def test__failed_request__raises(self):
+            links = Links('./ml-latest-small/micro_links.csv', self.mov,
+                          use_cache=False, fetcher=Tests.StubFetcher({}))
+            with pytest.raises(RuntimeError):
+                links.top_directors(3)
 
     class TestLinks:
         @classmethod
@@ -769,8 +3170,8 @@ class Tests:
         def test__most_expensive__is_sorted(self):
             result = self.links.most_expensive(10)
 
-            # is sorted correctly (by descending order)
-            values = list(result.values())
+            # is sorted correctly (by descending order of amounts)
+            values = [Links.parse_money(budget)[0] for budget in result.values()]
             is_sorted = True
             for i in range(1, len(values)):
                 if values[i - 1] < values[i]:
@@ -822,15 +3223,11 @@ class Tests:
         def test__longest__is_sorted(self):
             result = self.links.longest(10)
 
-            # is sorted correctly (by descending order)
-            def key_func(item):         # text to minutes
-                item = item.split()
-                return int(item[0]) * 60 + int(item[2])
-        
-            keys = list(result.values())
+            # is sorted correctly (by descending order of minutes)
+            keys = [Links.parse_runtime(runtime) for runtime in result.values()]
             is_sorted = True
             for i in range(1, len(keys)):
-                if key_func(keys[i - 1]) < key_func(keys[i]):
+                if keys[i - 1] < keys[i]:
                     is_sorted = False
                     break
             assert is_sorted
@@ -889,6 +3286,226 @@ class Tests:
             result = Statistics.variance([1, 2, 3])
             assert round(result, 5) == 0.66667
 
+            result = Statistics.variance([3, 1, 2])
+            assert round(result, 5) == 0.66667
+
+    class TestRunningStatistics:
+        """Tests for RunningStatistics class
+        """
+        values = [4.0, 0.5, 3.5, 5.0, 2.0, 3.0]
+
+        def test__update__same_as_statistics(self):
+            result = RunningStatistics().update(self.values)
+            assert result.count == len(self.values)
+            assert round(result.average(), 10) == round(Statistics.average(self.values), 10)
+            assert round(result.variance(), 10) == round(Statistics.variance(self.values), 10)
+
+        def test__merge__same_as_one_pass(self):
+            result = RunningStatistics().update(self.values[:2])
+            result.merge(RunningStatistics().update(self.values[2:]))
+            result.merge(RunningStatistics())
+
+            expected = RunningStatistics().update(self.values)
+            assert result.count == expected.count
+            assert round(result.average(), 10) == round(expected.average(), 10)
+            assert round(result.variance(), 10) == round(expected.variance(), 10)
+
+        def test__group__values(self):
+            result = RunningStatistics.group([(1, 2.0), (2, 5.0), (1, 4.0)])
+            assert list(result.keys()) == [1, 2]
+            assert result[1].average() == 3.0 and result[1].variance() == 1.0
+            assert result[2].count == 1
+
+        def test__empty__raises(self):
+            with pytest.raises(ValueError):
+                RunningStatistics().variance()
+
+    class TestGroupStatistics:
+        """Tests for GroupStatistics class
+        """
+        @classmethod
+        def setup_class(cls):
+            cls.keys = [2, 1, 2, 1, 2, 1, 1]
+            cls.values = [1.0, 5.0, 2.0, 3.0, 3.0, 4.0, 3.0]
+            cls.groups = GroupStatistics(cls.keys, cls.values)
+
+        def group_values(self, key):
+            return [value for group, value in zip(self.keys, self.values) if group == key]
+
+        def test__count__values(self):
+            assert self.groups.count() == {2: 3, 1: 4}
+
+        def test__sum__values(self):
+            assert self.groups.sum() == {2: 6.0, 1: 15.0}
+
+        def test__metrics__same_as_statistics(self):
+            for metric in (Statistics.average, Statistics.median, Statistics.variance):
+                result = self.groups.aggregate(metric)
+                assert list(result.keys()) == [2, 1]
+                for key, value in result.items():
+                    assert round(value, 10) == round(metric(self.group_values(key)), 10)
+
+        def test__aggregate__custom_metric(self):
+            assert self.groups.aggregate(max) == {2: 3.0, 1: 5.0}
+
+        def test__aggregate__quantile_sketch(self):
+            result = self.groups.aggregate(QuantileSketch(exact_limit=2))
+            assert result == self.groups.median()
+
+    class TestQuantileSketch:
+        """Tests for QuantileSketch class
+        """
+        values = [(index * 7919) % 1000 / 100 for index in range(1000)]
+
+        def test__call__exact(self):
+            result = QuantileSketch()(self.values[:101])
+            assert result == Statistics.median(self.values[:101])
+
+            result = QuantileSketch()(self.values[:100])
+            assert result == Statistics.median(self.values[:100])
+
+        def test__call__error_bound(self):
+            for error in (0.01, 0.5):
+                result = QuantileSketch(error=error, exact_limit=10)(self.values)
+                assert abs(result - Statistics.median(self.values)) <= error / 2
+
+        def test__merge__same_as_one_pass(self):
+            sketch = QuantileSketch(quantile=0.9, exact_limit=100)
+            result = sketch.copy_empty().update(self.values[:50])
+            result.merge(sketch.copy_empty().update(self.values[50:]))
+            assert result.count == len(self.values)
+            assert result.result() == sketch(self.values)
+
+        def test__add__large_count_not_expanded(self):
+            sketch = QuantileSketch(exact_limit=10).add(1.0, 3)
+            tracemalloc.start()
+            sketch.add(4.5, 80000)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            assert peak < 80000     # less than a byte per added value
+            assert sketch.count == 80003
+            assert sketch.result() == 4.5
+
+        def test__empty__raises(self):
+            with pytest.raises(ValueError):
+                QuantileSketch().result()
+
+    class TestCountMinSketch:
+        """Tests for CountMinSketch class
+        """
+        items = [f'tag{index % 50}' for index in range(2000)] + ['popular'] * 300
+
+        def test__estimate__error_bound(self):
+            sketch = CountMinSketch(error=0.01)
+            for item in self.items:
+                sketch.add(item)
+            for item, count in Counter(self.items).items():
+                assert count <= sketch.estimate(item) <= count + 0.01 * sketch.total
+
+        def test__most_common__bounded_candidates(self):
+            result = CountMinSketch(error=0.001, candidates=5).most_common(self.items, 3)
+            assert len(result) == 3
+            assert result[0] == ('popular', 300)
+
+        def test__invalid_settings__raises(self):
+            with pytest.raises(ValueError):
+                CountMinSketch(error=0)
+            with pytest.raises(ValueError):
+                CountMinSketch(failure=1.0)
+
+    class TestCalendarBuckets:
+        """Tests for CalendarBuckets class
+        """
+        timestamps = array('q', range(946684800 - 3 * 86400, 1009843200 + 3 * 86400, 3600 * 7 + 13))
+
+        @staticmethod
+        def count_exact(timestamps, label, tz):
+            return dict(Counter(label(datetime.fromtimestamp(timestamp, tz)) for timestamp in timestamps))
+
+        def test__count__same_as_datetime(self):
+            labels = {'year': lambda moment: moment.year,
+                      'month': lambda moment: (moment.year, moment.month),
+                      'week': lambda moment: moment.isocalendar()[:2],
+                      'day': lambda moment: moment.date()}
+            for tz in (None, timezone.utc, timezone(timedelta(hours=-5)), timezone(timedelta(hours=5, minutes=30))):
+                for unit, label in labels.items():
+                    result = CalendarBuckets(unit, tz).count(self.timestamps)
+                    assert result == self.count_exact(self.timestamps, label, tz)
+                    assert list(result) == sorted(result)
+
+        def test__count__daylight_saving_time(self):
+            zoneinfo = pytest.importorskip('zoneinfo')
+            tz = zoneinfo.ZoneInfo('America/New_York')
+            result = CalendarBuckets('day', tz).count(self.timestamps)
+            assert result == self.count_exact(self.timestamps, lambda moment: moment.date(), tz)
+
+        def test__count__empty(self):
+            assert CalendarBuckets('month').count(array('q')) == {}
+
+        def test__unknown_unit__raises(self):
+            with pytest.raises(ValueError):
+                CalendarBuckets('hour')
+
+    class TestRatingCodes:
+        """Tests for RatingCodes class
+        """
+        ratings = [(index * 7) % 10 / 2 + 0.5 for index in range(101)]
+
+        def test__encode__decode(self):
+            assert [RatingCodes.encode(text) for text in ('0.5', '4.0', '5', 3.5)] == [1, 8, 10, 7]
+            assert RatingCodes.decode(RatingCodes.encode('4.5')) == 4.5
+
+        def test__encode__invalid_raises(self):
+            for rating in ('4.3', '0', '5.5', '-1.0'):
+                with pytest.raises(ValueError):
+                    RatingCodes.encode(rating)
+
+        def test__kernels__same_as_statistics(self):
+            codes = array(RatingCodes.typecode, map(RatingCodes.encode, self.ratings))
+            assert RatingCodes.distribution(codes) == dict(sorted(Counter(self.ratings).items()))
+            assert RatingCodes.mean(codes) == pytest.approx(Statistics.average(self.ratings))
+            assert RatingCodes.variance(codes) == pytest.approx(Statistics.variance(self.ratings))
+            with pytest.raises(ValueError):
+                RatingCodes.mean(array(RatingCodes.typecode))
+
+    class TestRatingsMatrix:
+        """Tests for RatingsMatrix class
+        """
+        users = array('i', [7, 3, 7, 9, 3, 7])
+        movies = array('i', [20, 10, 5, 20, 20, 10])
+        codes = array(RatingCodes.typecode, [8, 10, 1, 6, 7, 9])
+
+        def test__from_columns__csr(self):
+            matrix = RatingsMatrix.from_columns(self.users, self.movies, self.codes)
+            assert matrix.shape == (3, 3) and len(matrix) == 6
+            assert list(matrix.row_ids) == [3, 7, 9] and list(matrix.col_ids) == [5, 10, 20]
+            assert list(matrix.indptr) == [0, 2, 5, 6]
+            assert list(matrix.indices) == [1, 2, 0, 1, 2, 2]
+            assert list(matrix.data) == [10, 7, 1, 9, 8, 6]
+            assert matrix.get_row(1) == (array('i', [0, 1, 2]), [0.5, 4.5, 4.0])
+
+        def test__reductions(self):
+            matrix = RatingsMatrix.from_columns(self.users, self.movies, self.codes)
+            assert list(matrix.row_counts()) == [2, 3, 1]
+            assert matrix.row_sums() == [8.5, 9.0, 3.0]
+            assert matrix.row_means() == [4.25, 3.0, 3.0]
+            assert list(matrix.col_counts()) == [1, 2, 3]
+            assert matrix.col_sums() == [0.5, 9.5, 10.5]
+
+        def test__transpose(self):
+            matrix = RatingsMatrix.from_columns(self.users, self.movies, self.codes)
+            transposed = matrix.transpose()
+            assert transposed.shape == (3, 3)
+            assert list(transposed.indptr) == [0, 1, 3, 6]
+            assert list(transposed.row_counts()) == list(matrix.col_counts())
+            assert transposed.row_sums() == matrix.col_sums()
+            assert transposed.transpose().data == matrix.data
+
+        def test__to_scipy(self):
+            pytest.importorskip('scipy')
+            matrix = RatingsMatrix.from_columns(self.users, self.movies, self.codes)
+            assert matrix.to_scipy()[1, 2] == 4.0
+
     class TestRatings:
         """Tests for Ratings class
         """
@@ -899,6 +3516,185 @@ class Tests:
             cls.ratings_movies = Ratings.Movies(cls.ratings, cls.mov)
             cls.ratings_users = Ratings.Users(cls.ratings, cls.mov)
 
+        def test__get_columns__types(self):
+            """Test are get_columns method result types correct
+            """
+            # call the method
+            result = self.ratings.get_columns()
+
+            # return type
+            assert isinstance(result, dict)
+            assert list(result.keys()) == ['userId', 'movieId', 'rating', 'timestamp']
+
+            # columns have the same length
+            lengths = set(len(column) for column in result.values())
+            assert len(lengths) == 1
+
+            # first data line
+            assert [column[0] for column in result.values()] == [1, 1, 8, 964982703]
+            assert len(bytes(result['rating'])) == len(result['rating'])   # one byte per rating
+
+        def test__get_next_data_line__ratings_decoded(self):
+            """Test are ratings of lines values, not codes of columns
+            """
+            assert next(self.ratings.get_next_data_line()) == [1, 1, 4.0, 964982703]
+
+        def test__get_columns__loaded_once(self):
+            """Test is get_columns method result shared between calls
+            """
+            assert self.ratings.get_columns() is self.ratings.get_columns()
+
+        def test__get_columns__malformed_line(self, tmp_path):
+            """Test is line with missing values an error instead of silently dropped column
+            """
+            with open(self.ratings.filename, 'r', encoding='utf-8') as file:
+                lines = [file.readline() for _ in range(3001)]
+            filename = str(tmp_path / 'ratings.csv')
+            with open(filename, 'w', encoding='utf-8') as file:
+                file.writelines(lines[:1000] + ['5,10,3.5\n'] + lines[1000:])
+
+            with pytest.raises(ValueError, match='5,10,3.5'):
+                Ratings(filename, use_cache=False).get_columns()
+            with pytest.raises(ValueError, match='5,10,3.5'):
+                Ratings(filename, workers=2).scan()
+
+        def test__scan__partial_last_line(self, tmp_path):
+            """Test is line being appended now left for the next scan
+            """
+            with open(self.ratings.filename, 'r', encoding='utf-8') as file:
+                lines = [file.readline() for _ in range(3001)]
+            filename = str(tmp_path / 'ratings.csv')
+            with open(filename, 'w', encoding='utf-8') as file:
+                file.writelines(lines)
+                file.write('1,1,4')
+
+            ratings = Ratings(filename, workers=2)
+            assert ratings.scan().rows == 3000
+            assert Ratings.Movies(ratings, self.mov).dist_by_year() != {}
+            with pytest.raises(ValueError, match="'1,1,4'"):
+                Ratings(filename, use_cache=False).get_columns()
+
+        def test__get_matrix__same_as_columns(self):
+            """Test is get_matrix method result built from all ratings
+            """
+            columns = self.ratings.get_columns()
+            matrix = self.ratings.get_matrix()
+            assert len(matrix) == len(columns['rating'])
+            assert dict(zip(matrix.col_ids, matrix.col_counts())) == Counter(columns['movieId'])
+            assert matrix is self.ratings.get_matrix()
+
+        def test__get_byte_ranges__aligned(self):
+            """Test are get_byte_ranges method ranges aligned to lines
+            """
+            ranges = self.ratings.get_byte_ranges(7)
+            assert len(ranges) == 7
+
+            with open(self.ratings.filename, 'rb') as file:
+                data = file.read()
+            assert ranges[0][0] == data.index(b'\n') + 1 and ranges[-1][1] == len(data)
+            for (_, end), (start, _) in zip(ranges, ranges[1:]):
+                assert end == start and data[start - 1:start] == b'\n'
+
+        def test__scan__same_as_columns(self):
+            """Test are parallel reports same as reports from columns
+            """
+            ratings = Ratings(self.ratings.filename, workers=3)
+            ratings_movies = Ratings.Movies(ratings, self.mov)
+            ratings_users = Ratings.Users(ratings, self.mov)
+
+            assert ratings.scan().rows == len(self.ratings.get_columns()['rating'])
+            assert ratings_movies.dist_by_year() == self.ratings_movies.dist_by_year()
+            assert ratings_movies.dist_by_rating() == self.ratings_movies.dist_by_rating()
+            assert ratings_movies.top_controversial(10) == self.ratings_movies.top_controversial(10)
+            assert list(ratings_users.dist_by_ratings_number().items()) == \
+                   list(self.ratings_users.dist_by_ratings_number().items())
+            assert ratings_users.top_by_variance(10) == self.ratings_users.top_by_variance(10)
+
+        def test__scan__incremental(self, tmp_path):
+            """Test are appended lines only parsed by incremental scan and merged into saved state
+            """
+            with open(self.ratings.filename, 'r', encoding='utf-8') as file:
+                lines = file.readlines()
+            filename = str(tmp_path / 'ratings.csv')
+            with open(filename, 'w', encoding='utf-8') as file:
+                file.writelines(lines[:60000])
+            assert Ratings(filename, incremental=True).scan().rows == 59999
+
+            # appended lines, the last one is not complete yet
+            appended = ''.join(lines[60000:]).encode()
+            with open(filename, 'a', encoding='utf-8') as file:
+                file.writelines(lines[60000:])
+                file.write('1,1,4')
+            ratings = Ratings(filename, incremental=True)
+            assert ratings.scan().rows == len(lines) - 1
+            assert ratings.scanned_bytes == len(appended)
+
+            ratings_movies = Ratings.Movies(ratings, self.mov)
+            ratings_users = Ratings.Users(ratings, self.mov)
+            assert ratings_movies.dist_by_year() == self.ratings_movies.dist_by_year()
+            assert ratings_movies.dist_by_rating() == self.ratings_movies.dist_by_rating()
+            assert list(ratings_users.dist_by_ratings_number().items()) == \
+                   list(self.ratings_users.dist_by_ratings_number().items())
+            assert ratings_users.top_by_variance(10) == \
+                   pytest.approx(self.ratings_users.top_by_variance(10), abs=0.011)
+
+            # nothing new, then the incomplete line is completed
+            ratings = Ratings(filename, incremental=True)
+            assert ratings.scan().rows == len(lines) - 1 and ratings.scanned_bytes == 0
+            with open(filename, 'a', encoding='utf-8') as file:
+                file.write('.0,964982703\n')
+            ratings = Ratings(filename, incremental=True)
+            assert ratings.scan().rows == len(lines)
+            assert ratings.scanned_bytes == len('1,1,4.0,964982703\n')
+
+        def test__scan__incremental_reports(self, tmp_path):
+            """Test are reports served from saved state after appending, without parsing the whole file
+            """
+            with open(self.ratings.filename, 'r', encoding='utf-8') as file:
+                lines = file.readlines()
+            filename = str(tmp_path / 'ratings.csv')
+            with open(filename, 'w', encoding='utf-8') as file:
+                file.writelines(lines[:60000])
+            Ratings(filename, incremental=True).scan()
+            with open(filename, 'a', encoding='utf-8') as file:
+                file.writelines(lines[60000:])
+
+            ratings = Ratings(filename, incremental=True)
+            ratings.get_columns = lambda: pytest.fail('columns of the whole file are parsed')
+            ratings.get_matrix = lambda: pytest.fail('matrix of the whole file is built')
+            ratings_movies = Ratings.Movies(ratings, self.mov)
+            ratings_users = Ratings.Users(ratings, self.mov)
+
+            assert ratings_movies.top_by_num_of_ratings(10) == self.ratings_movies.top_by_num_of_ratings(10)
+            for metric in (Statistics.average, Statistics.median):
+                assert ratings_movies.top_by_ratings(10, metric) == \
+                       self.ratings_movies.top_by_ratings(10, metric)
+                result = ratings_users.dist_by_ratings_values(metric)
+                expected = self.ratings_users.dist_by_ratings_values(metric)
+                assert list(result) == list(expected)
+                assert list(result.values()) == pytest.approx(list(expected.values()))
+            assert ratings.scanned_bytes == len(''.join(lines[60000:]).encode())
+
+        def test__scan__incremental_truncated(self, tmp_path):
+            """Test is truncated or rewritten file scanned from the beginning
+            """
+            with open(self.ratings.filename, 'r', encoding='utf-8') as file:
+                lines = [file.readline() for _ in range(1001)]
+            filename = str(tmp_path / 'ratings.csv')
+            with open(filename, 'w', encoding='utf-8') as file:
+                file.writelines(lines)
+            assert Ratings(filename, incremental=True).scan().rows == 1000
+
+            with open(filename, 'w', encoding='utf-8') as file:
+                file.writelines(lines[:501])
+            assert Ratings(filename, incremental=True).scan().rows == 500
+
+            with open(filename, 'w', encoding='utf-8') as file:
+                file.writelines(lines[:1] + lines[501:])
+            ratings = Ratings(filename, incremental=True)
+            assert ratings.scan().rows == 500
+            assert ratings.scanned_bytes == os.path.getsize(filename) - len(lines[0])
+
         def test__movies__dist_by_years__types(self):
             """Test are dist_by_years method result types correct
             """
@@ -1181,6 +3977,126 @@ class Tests:
             assert len(result) == 10
 
 
+    class TestGenres:
+        """Tests for Genres class
+        """
+        @classmethod
+        def setup_class(cls):
+            cls.ratings = Ratings('ml-latest-small/ratings.csv')
+            cls.mov = Movies('./ml-latest-small/movies.csv')
+            cls.genres = Genres(cls.ratings, cls.mov)
+
+        def test__cooccurrence__values(self):
+            result = self.genres.cooccurrence()
+            dist_by_genres = self.mov.dist_by_genres()
+
+            assert list(result.keys()) == self.mov.genres_vocabulary
+            for genre, row in result.items():
+                assert row[genre] == dist_by_genres[genre]
+                for other, count in row.items():
+                    assert count == result[other][genre]
+
+        def test__rating_statistics__values(self):
+            result = self.genres.rating_statistics()
+            assert len(result) == len(self.mov.genres_vocabulary)
+
+            # check one genre with lists of ratings
+            movie_ids = set(self.mov.get_movies_with_genres(['Film-Noir']))
+            columns = self.ratings.get_columns()
+            ratings = [RatingCodes.decode(code)
+                       for movie_id, code in zip(columns['movieId'], columns['rating'])
+                       if movie_id in movie_ids]
+            assert result['Film-Noir'] == {'count': len(ratings),
+                                           'average': round(Statistics.average(ratings), 2),
+                                           'variance': round(Statistics.variance(ratings), 2)}
+
+        def test__rating_statistics__is_sorted(self):
+            values = [statistics['count'] for statistics in self.genres.rating_statistics().values()]
+            assert values == sorted(values, reverse=True)
+
+    class TestItemSimilarity:
+        """Tests for ItemSimilarity class on small generated ratings
+        """
+        @classmethod
+        def setup_class(cls):
+            cls.mov = Movies('./ml-latest-small/movies.csv')
+
+        @staticmethod
+        def create_ratings(tmp_path):
+            filename = str(tmp_path / 'ratings.csv')
+            with open(filename, 'w', encoding='utf-8') as file:
+                file.write('userId,movieId,rating,timestamp\n')
+                for user_id in range(1, 31):
+                    for movie_id in range(1, 13):
+                        if (user_id * 7 + movie_id * 3) % 5 < 3:
+                            rating = ((user_id * movie_id) % 10 + 1) / 2
+                            file.write(f'{user_id},{movie_id},{rating},{964982703 + movie_id}\n')
+                file.write('31,13,4.0,964982703\n')            # movie without neighbours
+            return filename
+
+        @staticmethod
+        def brute_force(filename, metric):
+            ratings = defaultdict(dict)         # movieId -> userId -> rating
+            with open(filename, 'r', encoding='utf-8') as file:
+                file.readline()
+                for line in file:
+                    user_id, movie_id, rating, _ = line.split(',')
+                    ratings[int(movie_id)][int(user_id)] = float(rating)
+            if metric == 'pearson':
+                for movie_ratings in ratings.values():
+                    mean = Statistics.average(list(movie_ratings.values()))
+                    for user_id in movie_ratings:
+                        movie_ratings[user_id] -= mean
+
+            def norm(vector):
+                return math.sqrt(sum(value * value for value in vector.values()))
+
+            result = {}
+            for movie_id, vector in ratings.items():
+                result[movie_id] = {other: sum(value * other_vector[user_id]
+                                               for user_id, value in vector.items()
+                                               if user_id in other_vector) / (norm(vector) * norm(other_vector))
+                                    for other, other_vector in ratings.items()
+                                    if other != movie_id and norm(vector) and norm(other_vector)
+                                    and vector.keys() & other_vector.keys()}
+            return result
+
+        def test__similar__same_as_brute_force(self, tmp_path):
+            filename = self.create_ratings(tmp_path)
+            for metric in ItemSimilarity.metrics:
+                similarity = ItemSimilarity(Ratings(filename), self.mov, metric, k=4, block_size=5)
+                expected = self.brute_force(filename, metric)
+                for movie_id in range(1, 13):
+                    result = similarity.similar(movie_id)
+                    assert len(result) == min(4, len(expected[movie_id]))
+                    best = sorted(expected[movie_id].values(), reverse=True)[:4]
+                    assert [score for _, score in result] == pytest.approx(best, abs=1e-6)
+                    for other, score in result:
+                        assert expected[movie_id][other] == pytest.approx(score, abs=1e-6)
+                assert similarity.similar(13) == []
+                assert similarity.similar(100) == []
+
+        def test__workers__same_as_one_process(self, tmp_path):
+            filename = self.create_ratings(tmp_path)
+            ratings = Ratings(filename, use_cache=False)
+            one = ItemSimilarity(ratings, self.mov, k=3, block_size=4, use_cache=False)
+            parallel = ItemSimilarity(ratings, self.mov, k=3, block_size=4, workers=2, use_cache=False)
+            assert one.get_neighbours() == parallel.get_neighbours()
+
+        def test__get_neighbours__memory_mapped(self, tmp_path):
+            filename = self.create_ratings(tmp_path)
+            result = ItemSimilarity(Ratings(filename), self.mov, k=3).similar_titles(1)
+            assert os.path.exists(filename + '.cosine-3.neighbours')
+
+            similarity = ItemSimilarity(Ratings(filename), self.mov, k=3)
+            assert isinstance(similarity.get_neighbours()['scores'], memoryview)
+            assert similarity.similar_titles(1) == result
+            assert len(similarity.similar_titles(1, 2)) == 2
+
+        def test__unknown_metric__raises(self):
+            with pytest.raises(ValueError):
+                ItemSimilarity(Ratings('./ml-latest-small/ratings.csv'), self.mov, 'jaccard')
+
     class TestTags:
         """Tests for Tags class
         """
@@ -1281,3 +4197,46 @@ class Tests:
                 if result[i - 1][0] > result[i][0]:
                     sort_list = False
             assert sort_list
+
+        def test_tags_with_same_as_scan(self):
+            tags = self.tags.get_columns()['tag']
+            for word in ('comedy', 'Fun', 'ing', 'a', '', 'new york', 'zzzq'):
+                expected = sorted({tag for tag in tags if word.lower() in tag.lower()})
+                assert self.tags.tags_with(word) == expected
+
+        def test_tags_with_whole_word(self):
+            result = self.tags.tags_with('fun', whole_word=True)
+            assert result == ['fun', 'fun family movie']
+            assert 'funny' in self.tags.tags_with('fun')
+
+        def test_quoted_tag(self):
+            assert '"artsy"' in self.tags.get_columns()['tag']
+
+        def test_most_popular_case_folded_counts(self):
+            expected = Counter(tag.casefold() for tag in self.tags.get_columns()['tag'])
+            assert self.tags.most_popular(10) == dict(expected.most_common(10))
+
+        def test_most_popular_sketch(self):
+            result = self.tags.most_popular(3, CountMinSketch(error=0.0005, candidates=10))
+            exact = self.tags.most_popular(3)
+            assert list(result)[0] == list(exact)[0]
+            assert all(result[tag] >= count for tag, count in exact.items() if tag in result)
+
+        def test_most_words_counts_words(self):
+            result = self.tags.most_words(10)
+            assert result['based on a true story'] == 5
+            assert all(len(re.findall(r'\w+', tag)) == words for tag, words in result.items())
+
+        def test_features_table(self):
+            features = TagFeatures(['Sci-Fi', 'funny', 'Sci-Fi', 'dark comedy'])
+            assert features.tags == ['Sci-Fi', 'funny', 'dark comedy']
+            assert features.frequencies.tolist() == [2, 1, 1]
+            assert features.lengths.tolist() == [6, 5, 11]
+            assert features.words.tolist() == [2, 1, 2]
+            assert features.top(features.words, 2) == [('Sci-Fi', 2), ('dark comedy', 2)]
+
+        def test_most_words_and_longest_union(self):
+            result = self.tags.most_words_and_longest(10)
+            expected = list(self.tags.most_words(10))
+            expected += [tag for tag in self.tags.longest(10) if tag not in expected]
+            assert result == expected